@@ -0,0 +1,74 @@
+"""Add full-text search index over patients
+
+Revision ID: 1a6c0e5d8b27
+Revises: e7d3b9a24f51
+Create Date: 2026-10-17 17:36:50.118452
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1a6c0e5d8b27'
+down_revision: Union[str, None] = 'e7d3b9a24f51'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = "name, condition, allergies, current_medications, medical_history"
+NEW = ", ".join(f"new.{c.strip()}" for c in COLUMNS.split(","))
+OLD = ", ".join(f"old.{c.strip()}" for c in COLUMNS.split(","))
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            ALTER TABLE patient ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(condition, '')), 'B') ||
+                setweight(to_tsvector('simple',
+                    coalesce(allergies, '') || ' ' || coalesce(current_medications, '')), 'C') ||
+                setweight(to_tsvector('simple', coalesce(medical_history, '')), 'D')
+            ) STORED
+        """)
+        op.execute("CREATE INDEX IF NOT EXISTS ix_patient_search_vector ON patient USING GIN (search_vector)")
+        return
+
+    op.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5(
+            {COLUMNS},
+            content='patient', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+        )
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS patient_fts_ai AFTER INSERT ON patient BEGIN
+            INSERT INTO patient_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS patient_fts_ad AFTER DELETE ON patient BEGIN
+            INSERT INTO patient_fts(patient_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS patient_fts_au AFTER UPDATE OF {COLUMNS} ON patient BEGIN
+            INSERT INTO patient_fts(patient_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD});
+            INSERT INTO patient_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW});
+        END
+    """)
+    op.execute("INSERT INTO patient_fts(patient_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_patient_search_vector")
+        op.execute("ALTER TABLE patient DROP COLUMN IF EXISTS search_vector")
+        return
+
+    for trigger in ('patient_fts_au', 'patient_fts_ad', 'patient_fts_ai'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS patient_fts")
@@ -0,0 +1,28 @@
+"""Add FileRecord.key_version for master key rotation
+
+Revision ID: 3f9c1a7d2b64
+Revises: e546a4069367
+Create Date: 2026-10-17 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1a7d2b64'
+down_revision: Union[str, None] = 'e546a4069367'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('filerecord', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('key_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('filerecord', schema=None) as batch_op:
+        batch_op.drop_column('key_version')
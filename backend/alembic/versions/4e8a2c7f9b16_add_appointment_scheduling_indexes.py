@@ -0,0 +1,52 @@
+"""Add appointment scheduling indexes and overlap constraint
+
+Revision ID: 4e8a2c7f9b16
+Revises: 9c2f6d1e4a73
+Create Date: 2026-10-17 19:41:08.572930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8a2c7f9b16'
+down_revision: Union[str, None] = '9c2f6d1e4a73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# APPOINTMENT_DEFAULT_MINUTES at the time of this migration
+DEFAULT_MINUTES = 30
+
+
+def upgrade() -> None:
+    op.create_index('ix_appointment_doctor_start', 'appointment', ['doctor_id', 'start_at'], unique=False)
+    op.create_index('ix_appointment_patient_start', 'appointment', ['patient_id', 'start_at'], unique=False)
+
+    # conflict checks compare end_at; give open-ended rows the default length
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            f"UPDATE appointment SET end_at = start_at + interval '{DEFAULT_MINUTES} minutes' WHERE end_at IS NULL"
+        )
+        # existing overlapping bookings must be resolved before this succeeds
+        op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        op.execute("""
+            ALTER TABLE appointment ADD CONSTRAINT ex_appointment_doctor_overlap
+                EXCLUDE USING gist (doctor_id WITH =, tsrange(start_at, end_at) WITH &&)
+                WHERE (status <> 'cancelled' AND doctor_id IS NOT NULL AND end_at IS NOT NULL)
+        """)
+    else:
+        # keep the stored text format (fractional seconds included) so comparisons hold
+        op.execute(
+            f"UPDATE appointment SET end_at = datetime(start_at, '+{DEFAULT_MINUTES} minutes') "
+            "|| substr(start_at, 20) WHERE end_at IS NULL"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("ALTER TABLE appointment DROP CONSTRAINT IF EXISTS ex_appointment_doctor_overlap")
+    op.drop_index('ix_appointment_patient_start', table_name='appointment')
+    op.drop_index('ix_appointment_doctor_start', table_name='appointment')
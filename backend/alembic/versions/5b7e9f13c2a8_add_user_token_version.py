@@ -0,0 +1,28 @@
+"""Add User.token_version for stateless token revocation
+
+Revision ID: 5b7e9f13c2a8
+Revises: 8d2e4b6a1c90
+Create Date: 2026-10-17 13:27:05.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e9f13c2a8'
+down_revision: Union[str, None] = '8d2e4b6a1c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,30 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: 8d2e4b6a1c90
+Revises: 3f9c1a7d2b64
+Create Date: 2026-10-17 11:02:17.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e4b6a1c90'
+down_revision: Union[str, None] = '3f9c1a7d2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_patient_created_at_id', 'patient', ['created_at', 'id'])
+    op.create_index('ix_filerecord_patient_uploaded_id', 'filerecord', ['patient_id', 'uploaded_at', 'id'])
+    op.create_index('ix_auditlog_timestamp_id', 'auditlog', ['timestamp', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_auditlog_timestamp_id', table_name='auditlog')
+    op.drop_index('ix_filerecord_patient_uploaded_id', table_name='filerecord')
+    op.drop_index('ix_patient_created_at_id', table_name='patient')
@@ -0,0 +1,28 @@
+"""Add Patient.updated_at for ETags
+
+Revision ID: 9c2f6d1e4a73
+Revises: 1a6c0e5d8b27
+Create Date: 2026-10-17 18:52:14.306127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2f6d1e4a73'
+down_revision: Union[str, None] = '1a6c0e5d8b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Plain ALTER TABLE rather than batch mode: a batch table rebuild on SQLite would
+# drop the patient_fts triggers. Both statements are native on SQLite >= 3.35.
+def upgrade() -> None:
+    op.add_column('patient', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('patient', 'updated_at')
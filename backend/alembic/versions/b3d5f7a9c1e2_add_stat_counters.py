@@ -0,0 +1,56 @@
+"""Add StatCounter table for dashboard statistics
+
+Revision ID: b3d5f7a9c1e2
+Revises: 4e8a2c7f9b16
+Create Date: 2026-10-17 20:27:43.915862
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d5f7a9c1e2'
+down_revision: Union[str, None] = '4e8a2c7f9b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'statcounter',
+        sa.Column('metric', sa.String(), nullable=False),
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('metric', 'key'),
+    )
+    op.create_index('ix_statcounter_metric_value', 'statcounter', ['metric', 'value'], unique=False)
+
+    # backfill from the base tables (doctor activity fills in as events are written;
+    # scripts/rebuild_stats.py also recomputes it from the live audit log)
+    if op.get_bind().dialect.name == 'postgresql':
+        day = "to_char(uploaded_at, 'YYYY-MM-DD')"
+    else:
+        day = "date(uploaded_at)"
+    op.execute("INSERT INTO statcounter (metric, key, value) SELECT 'patients_total', '', count(*) FROM patient")
+    op.execute(
+        "INSERT INTO statcounter (metric, key, value) "
+        "SELECT 'patients_by_condition', trim(coalesce(condition, '')), count(*) FROM patient "
+        "GROUP BY trim(coalesce(condition, ''))"
+    )
+    op.execute("INSERT INTO statcounter (metric, key, value) SELECT 'files_total', '', count(*) FROM filerecord")
+    op.execute(
+        "INSERT INTO statcounter (metric, key, value) "
+        "SELECT 'files_by_patient', CAST(patient_id AS VARCHAR), count(*) FROM filerecord GROUP BY patient_id"
+    )
+    op.execute(
+        f"INSERT INTO statcounter (metric, key, value) "
+        f"SELECT 'uploads_by_day', {day}, count(*) FROM filerecord GROUP BY {day}"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_statcounter_metric_value', table_name='statcounter')
+    op.drop_table('statcounter')
@@ -0,0 +1,32 @@
+"""Add composite indexes for audit log queries
+
+Revision ID: c4a18e6f0d37
+Revises: 5b7e9f13c2a8
+Create Date: 2026-10-17 14:51:38.207163
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a18e6f0d37'
+down_revision: Union[str, None] = '5b7e9f13c2a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_auditlog_actor_timestamp_id', 'auditlog', ['actor_id', 'timestamp', 'id'])
+    op.create_index('ix_auditlog_action_timestamp_id', 'auditlog', ['action', 'timestamp', 'id'])
+    op.create_index(
+        'ix_auditlog_target_timestamp_id', 'auditlog', ['target_type', 'target_id', 'timestamp', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_auditlog_target_timestamp_id', table_name='auditlog')
+    op.drop_index('ix_auditlog_action_timestamp_id', table_name='auditlog')
+    op.drop_index('ix_auditlog_actor_timestamp_id', table_name='auditlog')
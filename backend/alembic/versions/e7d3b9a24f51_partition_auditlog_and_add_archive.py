@@ -0,0 +1,115 @@
+"""Partition auditlog by month (Postgres) and add AuditArchive
+
+Revision ID: e7d3b9a24f51
+Revises: c4a18e6f0d37
+Create Date: 2026-10-17 16:08:12.663920
+
+"""
+from typing import Sequence, Union
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7d3b9a24f51'
+down_revision: Union[str, None] = 'c4a18e6f0d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+AUDIT_INDEXES = {
+    'ix_auditlog_timestamp_id': ['timestamp', 'id'],
+    'ix_auditlog_actor_timestamp_id': ['actor_id', 'timestamp', 'id'],
+    'ix_auditlog_action_timestamp_id': ['action', 'timestamp', 'id'],
+    'ix_auditlog_target_timestamp_id': ['target_type', 'target_id', 'timestamp', 'id'],
+}
+MONTHS_AHEAD = 3
+
+
+def _add_months(dt: datetime.datetime, n: int) -> datetime.datetime:
+    years, month = divmod(dt.month - 1 + n, 12)
+    return dt.replace(year=dt.year + years, month=month + 1)
+
+
+def _month_start(dt: datetime.datetime) -> datetime.datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _partition_auditlog() -> None:
+    """
+    Rebuild auditlog as a table range-partitioned by month on "timestamp".
+    The primary key must include the partition key, so it becomes (id, timestamp).
+    """
+    bind = op.get_bind()
+    for name in AUDIT_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER TABLE auditlog RENAME TO auditlog_unpartitioned')
+    op.execute('ALTER TABLE auditlog_unpartitioned DROP CONSTRAINT IF EXISTS auditlog_pkey')
+    op.execute(
+        'CREATE TABLE auditlog (LIKE auditlog_unpartitioned INCLUDING DEFAULTS) '
+        'PARTITION BY RANGE ("timestamp")'
+    )
+    op.execute('ALTER TABLE auditlog ADD PRIMARY KEY (id, "timestamp")')
+    op.execute('ALTER SEQUENCE IF EXISTS auditlog_id_seq OWNED BY auditlog.id')
+    op.execute('CREATE TABLE auditlog_default PARTITION OF auditlog DEFAULT')
+
+    now = _month_start(datetime.datetime.utcnow())
+    oldest = bind.execute(sa.text('SELECT min("timestamp") FROM auditlog_unpartitioned')).scalar()
+    start = _month_start(oldest) if oldest is not None else now
+    while start <= _add_months(now, MONTHS_AHEAD):
+        end = _add_months(start, 1)
+        op.execute(
+            f"CREATE TABLE auditlog_y{start.year:04d}m{start.month:02d} PARTITION OF auditlog "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        start = end
+
+    for name, columns in AUDIT_INDEXES.items():
+        op.create_index(name, 'auditlog', columns)
+    op.execute('INSERT INTO auditlog SELECT * FROM auditlog_unpartitioned')
+    op.execute('DROP TABLE auditlog_unpartitioned')
+
+
+def _unpartition_auditlog() -> None:
+    for name in AUDIT_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute('ALTER TABLE auditlog RENAME TO auditlog_partitioned')
+    op.execute('CREATE TABLE auditlog (LIKE auditlog_partitioned INCLUDING DEFAULTS)')
+    op.execute('ALTER TABLE auditlog ADD PRIMARY KEY (id)')
+    op.execute('ALTER SEQUENCE IF EXISTS auditlog_id_seq OWNED BY auditlog.id')
+    for name, columns in AUDIT_INDEXES.items():
+        op.create_index(name, 'auditlog', columns)
+    op.execute('INSERT INTO auditlog SELECT * FROM auditlog_partitioned')
+    op.execute('DROP TABLE auditlog_partitioned CASCADE')
+
+
+def upgrade() -> None:
+    op.create_table(
+        'auditarchive',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('period_end', sa.DateTime(), nullable=False),
+        sa.Column('object_key', sa.String(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('min_id', sa.Integer(), nullable=True),
+        sa.Column('max_id', sa.Integer(), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('wrapped_dek', sa.String(), nullable=False),
+        sa.Column('key_version', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_auditarchive_period_start', 'auditarchive', ['period_start'])
+
+    # SQLite has no declarative partitioning; there the live table is a rolling
+    # window trimmed by the compaction job instead.
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_auditlog()
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_auditlog()
+    op.drop_index('ix_auditarchive_period_start', table_name='auditarchive')
+    op.drop_table('auditarchive')
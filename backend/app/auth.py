@@ -1,15 +1,21 @@
 # app/auth.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from passlib.context import CryptContext
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from datetime import datetime, timedelta
+from typing import Optional
 import jwt
 
+from app import crud
 from app.models import User
-from app.db import get_session
+from app.db import get_async_session
 from app.config import settings
+from app.services import passwords
+from app.services.audit_writer import audit_writer
+from app.services.auth_cache import token_versions, user_cache, forget_user
+from app.services.rate_limit import login_ip_limiter, login_account_limiter
 
 
 SECRET_KEY = settings.JWT_SECRET_KEY
@@ -18,8 +24,6 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # must match frontend login URL (WITHOUT slash)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -28,11 +32,29 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 # UTILS
 # ================================
 def hash_password(password: str):
-    return pwd_context.hash(password)
+    return passwords.hash_password_sync(password)
 
 
 def verify_password(password: str, hashed: str):
-    return pwd_context.verify(password, hashed)
+    return passwords.verify_and_update_sync(password, hashed)[0]
+
+
+def _too_many(retry_after: float, detail: str):
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+    )
+
+
+async def _hash_or_429(coro):
+    """
+    Await a password-pool call, turning back-pressure into 429.
+    """
+    try:
+        return await coro
+    except passwords.PasswordPoolBusy:
+        raise _too_many(1, "Server busy, please retry")
 
 
 def create_access_token(data: dict):
@@ -46,10 +68,40 @@ def create_access_token(data: dict):
 # ================================
 # AUTH: CURRENT USER
 # ================================
-def get_current_user(
+class Principal:
+    """
+    The authenticated caller as asserted by a verified token: enough for
+    authorization (`id`, `role`) without loading the User row.
+    """
+    __slots__ = ("id", "role", "token_version")
+
+    def __init__(self, id: str, role: Optional[str], token_version: int = 0):
+        self.id = id
+        self.role = role
+        self.token_version = token_version
+
+
+async def _current_token_version(session: AsyncSession, user_id: str) -> Optional[int]:
+    version = token_versions.get(user_id)
+    if version is None:
+        version = await crud.get_token_version(session, user_id)
+        if version is not None:
+            token_versions.put(user_id, version)
+    return version
+
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
+    """
+    Verify the bearer token and return the caller.
+
+    With AUTH_STATELESS the signed `sub`/`role` claims are trusted and only the
+    token version is checked, from a short-lived cache, so hot endpoints skip the
+    User lookup. Role changes take effect on the next login; revoke the user's
+    tokens to apply them sooner.
+    """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
@@ -57,20 +109,50 @@ def get_current_user(
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = session.get(User, user_id)
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-
-        return user
-
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
 
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+    token_version = payload.get("tv", 0)
+
+    if not settings.AUTH_STATELESS:
+        user = await session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        if user.token_version != token_version:
+            raise HTTPException(status_code=401, detail="Token revoked")
+        return user
 
-def require_admin(user: User = Depends(get_current_user)):
+    current = await _current_token_version(session, user_id)
+    if current is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    if current != token_version:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return Principal(user_id, payload.get("role"), token_version)
+
+
+async def get_current_user_record(
+    principal=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> User:
+    """
+    Full User row for handlers that need more than id/role, served from a TTL cache.
+    """
+    if isinstance(principal, User):
+        return principal
+    data = user_cache.get(principal.id)
+    if data is None:
+        user = await crud.get_user_by_id(session, principal.id)
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        data = user.model_dump()
+        user_cache.put(principal.id, data)
+    return User(**data)
+
+
+def require_admin(user=Depends(get_current_user)):
     if user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
     return user
@@ -80,28 +162,27 @@ def require_admin(user: User = Depends(get_current_user)):
 # SIGNUP
 # ================================
 @router.post("/signup")
-def signup(
+async def signup(
     email: str,
     password: str,
     full_name: str = None,
     role: str = "doctor",
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
 
-    existing = session.exec(select(User).where(User.email == email)).first()
+    existing = (await session.exec(select(User).where(User.email == email))).first()
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     new_user = User(
         email=email,
-        hashed_password=hash_password(password),
+        hashed_password=await _hash_or_429(passwords.hash_password(password)),
         full_name=full_name,
         role=role,
     )
 
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    await session.commit()
 
     return {
         "message": "User created successfully",
@@ -113,18 +194,45 @@ def signup(
 # LOGIN
 # ================================
 @router.post("/login")
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    user = session.exec(
+    # throttle before any bcrypt work is queued
+    client_ip = request.client.host if request.client else "unknown"
+    wait = max(
+        login_ip_limiter.hit(client_ip),
+        login_account_limiter.hit(form_data.username.strip().lower()),
+    )
+    if wait:
+        raise _too_many(wait, "Too many login attempts, please retry later")
+
+    user = (await session.exec(
         select(User).where(User.email == form_data.username)
-    ).first()
+    )).first()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user:
+        audit_writer.record("auth.login_failed", target_type="user", summary=f"unknown account from {client_ip}")
         raise HTTPException(status_code=401, detail="Incorrect email or password")
 
-    token = create_access_token({"sub": user.id, "role": user.role})
+    ok, new_hash = await _hash_or_429(
+        passwords.verify_and_update(form_data.password, user.hashed_password)
+    )
+    if not ok:
+        audit_writer.record(
+            "auth.login_failed", user.id, user.role, "user", user.id, summary=f"bad password from {client_ip}"
+        )
+        raise HTTPException(status_code=401, detail="Incorrect email or password")
+
+    # stored hash used a different BCRYPT_ROUNDS; upgrade it now that we have the password
+    if new_hash:
+        user.hashed_password = new_hash
+        session.add(user)
+        await session.commit()
+
+    token = create_access_token({"sub": user.id, "role": user.role, "tv": user.token_version})
+    audit_writer.record("auth.login", user.id, user.role, "user", user.id, summary=f"from {client_ip}")
 
     return {
         "access_token": token,
@@ -136,3 +244,50 @@ def login(
             "full_name": user.full_name,
         },
     }
+
+
+# ================================
+# REVOCATION
+# ================================
+async def _revoke(session: AsyncSession, user_id: str) -> int:
+    version = await crud.bump_token_version(session, user_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    forget_user(user_id, version)
+    return version
+
+
+@router.post("/logout")
+async def logout(
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Revoke every token issued to the caller (signs out all sessions).
+    Other workers stop accepting them within AUTH_TOKEN_VERSION_TTL_SECONDS.
+    """
+    await _revoke(session, current_user.id)
+    return {"ok": True, "message": "Logged out"}
+
+
+@router.post("/revoke/{user_id}")
+async def revoke_user_tokens(
+    user_id: str,
+    current_user=Depends(require_admin),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Revoke every token issued to a user (admin only), e.g. after a role change.
+    """
+    await _revoke(session, user_id)
+    return {"ok": True, "message": "Tokens revoked"}
+
+
+@router.get("/me")
+async def me(user: User = Depends(get_current_user_record)):
+    return {
+        "id": user.id,
+        "email": user.email,
+        "role": user.role,
+        "full_name": user.full_name,
+    }
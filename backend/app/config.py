@@ -1,4 +1,5 @@
 # app/config.py
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -7,6 +8,23 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str = "sqlite:///./securecare_dev.db"
+    # Defaults to DATABASE_URL with the asyncio driver (aiosqlite / asyncpg)
+    ASYNC_DATABASE_URL: Optional[str] = None
+    DB_ECHO: bool = False
+    # Size pool_size + max_overflow (times worker count) against Postgres max_connections
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800  # seconds; recycle before server/proxy idle timeouts
+    DB_POOL_PRE_PING: bool = True
+    # SQLite only
+    SQLITE_WAL: bool = True
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_KB: int = 20000
+
+    # Object storage backend: "s3" (Backblaze B2), "local" or "memory"
+    STORAGE_BACKEND: str = "s3"
+    LOCAL_STORAGE_PATH: str = "./storage"
 
     # Backblaze (S3-compatible)
     B2_KEY_ID: str = ""
@@ -14,12 +32,113 @@ class Settings(BaseSettings):
     B2_BUCKET: str = ""
     B2_ENDPOINT: str = ""
 
+    # Object-storage client tuning (pool size also bounds the async executor)
+    B2_MAX_POOL_CONNECTIONS: int = 20
+    B2_MAX_ATTEMPTS: int = 5
+    B2_RETRY_MODE: str = "standard"  # "legacy" | "standard" | "adaptive"
+    B2_CONNECT_TIMEOUT: float = 5.0
+    B2_READ_TIMEOUT: float = 60.0
+
+    # Segmented file encryption / multipart upload sizing
+    ENCRYPTION_CHUNK_SIZE: int = 64 * 1024
+    UPLOAD_PART_SIZE: int = 8 * 1024 * 1024  # S3 minimum part size is 5 MiB
+    UPLOAD_READ_SIZE: int = 1024 * 1024  # plaintext slab handed to the encrypt worker per step
+
+    # Direct-to-storage uploads (presigned multipart PUT)
+    DIRECT_UPLOAD_EXPIRES_SECONDS: int = 3600
+
+    # Bulk upload
+    UPLOAD_BATCH_MAX_FILES: int = 500
+    UPLOAD_BATCH_CONCURRENCY: int = 8
+
     # Demo master key used to wrap DEKs (Fernet) — for student/demo only
     MASTER_FERNET_KEY: str = ""
+    # Version recorded on FileRecord.key_version for DEKs wrapped by MASTER_FERNET_KEY;
+    # bump it together with the key, keep the previous key(s) in MASTER_FERNET_OLD_KEYS
+    # (comma-separated, newest first) and run scripts/rotate_master_key.py
+    MASTER_KEY_VERSION: int = 1
+    MASTER_FERNET_OLD_KEYS: str = ""
+
+    # Unwrapped DEK cache (in-process, per worker)
+    DEK_CACHE_MAX_ENTRIES: int = 1024
+    DEK_CACHE_TTL_SECONDS: float = 300.0
+
+    # Audit pipeline (background batched writer with a local spool; each process spools to its own subdirectory)
+    AUDIT_SPOOL_DIR: str = "./audit_spool"
+    AUDIT_SPOOL_FSYNC: bool = False  # fsync every event (survives power loss, not just crashes)
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    AUDIT_QUEUE_MAX: int = 10000  # events also held in memory; the rest are read back from the spool
+    AUDIT_SEGMENT_MAX_ATTEMPTS: int = 5  # failed inserts (with the database up) before a segment is quarantined
+
+    # Audit retention: live months, then encrypted Parquet archives in object storage
+    AUDIT_HOT_MONTHS: int = 3  # current month plus the previous N-1 stay in the live table
+    AUDIT_PARTITION_MONTHS_AHEAD: int = 3  # Postgres: monthly partitions created in advance
+    AUDIT_ARCHIVE_COMPRESSION: str = "zstd"
+    AUDIT_ARCHIVE_FETCH_SIZE: int = 50000
+    AUDIT_ARCHIVE_MAX_ROWS: int = 200000  # rows per archive object; a month may span several
+    AUDIT_ARCHIVE_CACHE_ENTRIES: int = 4  # decoded archive objects kept in memory per worker
+
+    # Patient full-text search
+    SEARCH_MIN_TERM_CHARS: int = 2
+    SEARCH_MAX_TERMS: int = 8
+    SEARCH_MAX_OFFSET: int = 1000  # ranked results are paged by offset; stop paging past this
+
+    # Bulk patient import / export
+    PATIENT_IMPORT_BATCH_SIZE: int = 1000  # rows validated and inserted per transaction
+    PATIENT_IMPORT_MAX_ERRORS: int = 1000  # per-row errors listed in the report (all are counted)
+    PATIENT_EXPORT_FETCH_SIZE: int = 1000  # rows per server-side cursor fetch
+
+    # Read-through cache for patient detail / file listings
+    CACHE_BACKEND: str = "memory"  # "memory" (per worker), "redis" (shared) or "none"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_TTL_SECONDS: float = 30.0  # also bounds staleness across workers with "memory"
+    CACHE_MAX_ENTRIES: int = 10000
+
+    # Browser caching of decrypted file views (immutable per FileRecord); JSON is no-cache
+    HTTP_FILE_MAX_AGE_SECONDS: int = 3600
+
+    # Patient chart endpoint
+    CHART_APPOINTMENTS_LIMIT: int = 20
+    CHART_AUDIT_LIMIT: int = 20
+
+    # Appointment scheduling (times are naive UTC, like every other timestamp)
+    APPOINTMENT_DEFAULT_MINUTES: int = 30  # when end_at is not given
+    APPOINTMENT_MAX_MINUTES: int = 480  # also bounds the conflict query's index range
+    SCHEDULE_DAY_START_HOUR: int = 9  # bookable hours for free-slot searches
+    SCHEDULE_DAY_END_HOUR: int = 17
+    SCHEDULE_SEARCH_DAYS: int = 90  # first-available looks this far ahead
+    SCHEDULE_INDEX_TTL_SECONDS: float = 30.0  # reload a doctor's in-memory bookings after this
+
+    # Dashboard statistics (served from StatCounter rows)
+    STATS_ACTIVE_DOCTOR_DAYS: int = 30  # a doctor with any audited action in this window is active
+    STATS_DAYS_DEFAULT: int = 30  # uploads-per-day window
+    STATS_TOP_N: int = 10  # conditions / patients listed by count
+
+    # List endpoints (keyset pagination)
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 500
 
     # JWT secret for signing tokens (dev default provided so app boots even without .env)
     JWT_SECRET_KEY: str = "dev_secret_change_me"
 
+    # Stateless auth: trust the signed sub/role claims instead of loading the User per request
+    AUTH_STATELESS: bool = True
+    # How long a worker may keep accepting a token revoked on another worker
+    AUTH_TOKEN_VERSION_TTL_SECONDS: float = 30.0
+    AUTH_USER_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_CACHE_MAX_ENTRIES: int = 4096
+
+    # Password hashing (bcrypt on a dedicated process pool, per worker)
+    BCRYPT_ROUNDS: int = 12  # changing this rehashes each password on its next login
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32  # beyond this, login/signup answer 429
+
+    # Login rate limits (requests per window, per worker)
+    LOGIN_RATE_PER_IP: int = 30
+    LOGIN_RATE_PER_ACCOUNT: int = 10
+    LOGIN_RATE_WINDOW_SECONDS: float = 60.0
+
     # App
     APP_HOST: str = "0.0.0.0"
     APP_PORT: int = 8000
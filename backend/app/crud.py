@@ -1,144 +1,423 @@
-from typing import List, Optional, Dict, Any
-from sqlmodel import Session, select
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Set, Tuple
+from sqlmodel import select
+from sqlalchemy.orm import selectinload
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import column, func, insert, literal_column, table, text, tuple_, update
+from datetime import datetime, timedelta
 
-from .models import User, Patient, FileRecord, AuditLog
-from .db import engine
+from .models import User, Patient, FileRecord, Appointment, AuditLog
+from .config import settings
+from .services import cache, search, stats
+
+# Every helper takes the caller's AsyncSession (one per request via
+# db.get_async_session) so a request shares a single connection checkout. Sessions
+# are created with expire_on_commit=False, so returned objects stay usable after
+# commit without a refresh round trip (and without implicit IO on attribute access).
 
 
 # -------------------------
-# USER HELPERS
+# KEYSET PAGINATION
 # -------------------------
-def create_user(email: str, hashed_password: str, full_name: Optional[str] = None, role: str = "doctor") -> User:
-    with Session(engine) as session:
-        user = User(email=email, hashed_password=hashed_password, full_name=full_name, role=role)
-        session.add(user)
-        session.commit()
-        session.refresh(user)
-        return user
-
-
-def get_user_by_email(email: str) -> Optional[User]:
-    with Session(engine) as session:
-        statement = select(User).where(User.email == email)
-        return session.exec(statement).first()
-
-
-def get_user_by_id(user_id: str) -> Optional[User]:
-    with Session(engine) as session:
-        return session.get(User, user_id)
-
-
-def doctor_exists(doctor_id: str) -> bool:
-    with Session(engine) as session:
-        return session.get(User, doctor_id) is not None
+async def _keyset_page(
+    session: AsyncSession,
+    statement,
+    columns,
+    limit: int,
+    after: Optional[Tuple] = None,
+    descending: bool = False,
+):
+    """
+    Run `statement` ordered by `columns`, starting strictly after the `after` key
+    (in the requested direction). Returns (rows, next_key) where next_key is None on
+    the last page. Cost does not depend on how deep the page is, given an index on
+    `columns`.
+    """
+    if after is not None:
+        key = tuple_(*columns)
+        statement = statement.where(key < tuple_(*after) if descending else key > tuple_(*after))
+    order = [c.desc() for c in columns] if descending else columns
+    rows = (await session.exec(statement.order_by(*order).limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, tuple(getattr(last, c.key) for c in columns)
 
 
 # -------------------------
-# PATIENT HELPERS
+# USER HELPERS
 # -------------------------
-def create_patient(**data) -> Patient:
-    with Session(engine) as session:
-        p = Patient(**data)
-        session.add(p)
-        session.commit()
-        session.refresh(p)
-        return p
-
-
-def get_patient(patient_id: int) -> Optional[Patient]:
-    with Session(engine) as session:
-        return session.get(Patient, patient_id)
+async def create_user(
+    session: AsyncSession, email: str, hashed_password: str, full_name: Optional[str] = None, role: str = "doctor"
+) -> User:
+    user = User(email=email, hashed_password=hashed_password, full_name=full_name, role=role)
+    session.add(user)
+    await session.commit()
+    return user
 
 
-def patient_exists(patient_id: int) -> bool:
-    with Session(engine) as session:
-        return session.get(Patient, patient_id) is not None
+async def get_user_by_email(session: AsyncSession, email: str) -> Optional[User]:
+    statement = select(User).where(User.email == email)
+    return (await session.exec(statement)).first()
 
 
-def list_patients(limit: int = 100, offset: int = 0) -> List[Patient]:
-    with Session(engine) as session:
-        statement = select(Patient).offset(offset).limit(limit)
-        return session.exec(statement).all()
+async def get_user_by_id(session: AsyncSession, user_id: str) -> Optional[User]:
+    return await session.get(User, user_id)
 
 
-def update_patient(patient_id: int, data: Dict[str, Any]) -> Optional[Patient]:
-    with Session(engine) as session:
-        patient = session.get(Patient, patient_id)
-        if not patient:
-            return None
+async def get_token_version(session: AsyncSession, user_id: str) -> Optional[int]:
+    """
+    Current token version for a user, or None if the user does not exist.
+    """
+    statement = select(User.token_version).where(User.id == user_id)
+    return (await session.exec(statement)).first()
 
-        for k, v in data.items():
-            if hasattr(patient, k) and v is not None:
-                setattr(patient, k, v)
 
-        session.add(patient)
-        session.commit()
-        session.refresh(patient)
-        return patient
+async def bump_token_version(session: AsyncSession, user_id: str) -> Optional[int]:
+    """
+    Increment a user's token version, revoking every token issued before.
+    Returns the new version, or None if the user does not exist.
+    """
+    statement = (
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version)
+    )
+    version = (await session.exec(statement)).scalar_one_or_none()
+    await session.commit()
+    return version
 
 
-def delete_patient(patient_id: int) -> bool:
-    with Session(engine) as session:
-        patient = session.get(Patient, patient_id)
-        if not patient:
-            return False
-        session.delete(patient)
-        session.commit()
-        return True
+async def doctor_exists(session: AsyncSession, doctor_id: str) -> bool:
+    statement = select(User.id).where(User.id == doctor_id, User.role == "doctor")
+    return (await session.exec(statement)).first() is not None
 
 
+# -------------------------
+# PATIENT HELPERS
+# -------------------------
+async def create_patient(session: AsyncSession, **data) -> Patient:
+    p = Patient(**data)
+    session.add(p)
+    await stats.bump(session, stats.patient_deltas([p.condition]))
+    await session.commit()
+    return p
+
+
+async def create_patients(session: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+    """
+    Insert many patients in one transaction (executemany, no ORM objects).
+    created_at is filled in per row by the column default.
+    """
+    await session.exec(insert(Patient), params=rows)
+    await stats.bump(session, stats.patient_deltas(r.get("condition") for r in rows))
+    await session.commit()
+    return len(rows)
+
+
+async def get_patient(session: AsyncSession, patient_id: int) -> Optional[Patient]:
+    return await session.get(Patient, patient_id)
+
+
+async def get_patient_chart(
+    session: AsyncSession, patient_id: int, now: Optional[datetime] = None
+) -> Optional[Patient]:
+    """
+    Patient with `files` and upcoming (start_at >= now, not cancelled)
+    `appointments` eagerly loaded: three queries regardless of how many
+    related rows there are. Relationship lists are in load order; callers sort.
+    """
+    now = now or datetime.utcnow()
+    statement = (
+        select(Patient)
+        .where(Patient.id == patient_id)
+        .options(
+            selectinload(Patient.files),
+            selectinload(Patient.appointments.and_(
+                Appointment.start_at >= now, Appointment.status != "cancelled"
+            )),
+        )
+    )
+    return (await session.exec(statement)).first()
+
+
+async def patient_exists(session: AsyncSession, patient_id: int) -> bool:
+    return (await session.get(Patient, patient_id)) is not None
+
+
+async def existing_patient_ids(session: AsyncSession, patient_ids: Set[int]) -> Set[int]:
+    if not patient_ids:
+        return set()
+    statement = select(Patient.id).where(Patient.id.in_(patient_ids))
+    return set((await session.exec(statement)).all())
+
+
+async def list_patients(
+    session: AsyncSession, limit: int = 100, after: Optional[Tuple] = None
+) -> Tuple[List[Patient], Optional[Tuple]]:
+    """
+    Page of patients ordered by (created_at, id), after the given key.
+    """
+    return await _keyset_page(session, select(Patient), [Patient.created_at, Patient.id], limit, after)
+
+
+# columns a projected patient listing may select
+PATIENT_FIELDS = (
+    "id", "name", "age", "condition", "gender", "phone", "address", "emergency_contact",
+    "medical_history", "allergies", "current_medications", "created_at", "updated_at",
+)
+
+
+async def list_patient_fields(
+    session: AsyncSession, fields: List[str], limit: int = 100, after: Optional[Tuple] = None
+) -> Tuple[List[dict], Optional[Tuple]]:
+    """
+    Like list_patients, but SELECTs only `fields` (names from PATIENT_FIELDS) and
+    returns plain dicts instead of hydrated Patient objects. The keyset columns
+    are always fetched for the cursor but only returned when asked for.
+    """
+    keys = [Patient.created_at, Patient.id]
+    wanted = [getattr(Patient, f) for f in fields if f not in ("created_at", "id")]
+    rows, key = await _keyset_page(session, select(*keys, *wanted), keys, limit, after)
+    return [{f: getattr(r, f) for f in fields} for r in rows], key
+
+
+async def search_patients(session: AsyncSession, terms: List[str], limit: int = 20, offset: int = 0) -> List[Patient]:
+    """
+    Ranked prefix search over the patient full-text index (see services/search.py).
+    All terms must match; ties break on id so offsets page deterministically.
+
+    The engine scores every match and keeps only the requested page (FTS5 and
+    Postgres both sort with a bounded top-N), so the ranking is exact; patient
+    rows are fetched for that page alone. SEARCH_MIN_TERM_CHARS keeps the
+    broadest prefixes out.
+    """
+    if not terms:
+        return []
+    if session.bind.dialect.name == "postgresql":
+        query = func.to_tsquery("simple", search.postgres_tsquery(terms))
+        vector = literal_column("patient.search_vector")
+        score = func.ts_rank(vector, query).label("score")
+        ranked = (
+            select(Patient.id.label("rowid"), score)
+            .where(vector.op("@@")(query))
+            .order_by(score.desc(), Patient.id)
+        )
+        order = lambda c: c.score.desc()
+    else:
+        fts = table("patient_fts", column("rowid"))
+        weights = ", ".join(str(w) for w in search.SQLITE_BM25_WEIGHTS)
+        score = literal_column(f"bm25(patient_fts, {weights})").label("score")
+        ranked = (
+            select(fts.c.rowid, score)
+            .where(text("patient_fts MATCH :match").bindparams(match=search.sqlite_match(terms)))
+            .order_by(score, fts.c.rowid)  # bm25: lower is better
+        )
+        order = lambda c: c.score
+    page = ranked.limit(limit).offset(offset).subquery()
+    statement = (
+        select(Patient)
+        .join(page, page.c.rowid == Patient.id)
+        .order_by(order(page.c), Patient.id)
+    )
+    return (await session.exec(statement)).all()
+
+
+async def update_patient(session: AsyncSession, patient_id: int, data: Dict[str, Any]) -> Optional[Patient]:
+    patient = await session.get(Patient, patient_id)
+    if not patient:
+        return None
+
+    old_condition = patient.condition
+    for k, v in data.items():
+        if hasattr(patient, k) and v is not None:
+            setattr(patient, k, v)
+    patient.updated_at = datetime.utcnow()
+
+    session.add(patient)
+    if stats.condition_key(old_condition) != stats.condition_key(patient.condition):
+        await stats.bump(session, {
+            (stats.PATIENTS_BY_CONDITION, stats.condition_key(old_condition)): -1,
+            (stats.PATIENTS_BY_CONDITION, stats.condition_key(patient.condition)): 1,
+        })
+    await session.commit()
+    await cache.invalidate(cache.patient_ns(patient_id))
+    return patient
+
+
+async def delete_patient(session: AsyncSession, patient_id: int) -> bool:
+    patient = await session.get(Patient, patient_id)
+    if not patient:
+        return False
+    await session.delete(patient)
+    await stats.bump(session, stats.patient_deltas([patient.condition], sign=-1))
+    await session.commit()
+    await cache.invalidate(cache.patient_ns(patient_id), cache.patient_files_ns(patient_id))
+    return True
 
 
 # -------------------------
 # FILE HELPERS
 # -------------------------
-def create_file_record(
-    patient_id: int, file_key: str, filename: str, wrapped_dek: Optional[str] = None
+async def create_file_record(
+    session: AsyncSession,
+    patient_id: int,
+    file_key: str,
+    filename: str,
+    wrapped_dek: Optional[str] = None,
+    key_version: int = 1,
 ) -> FileRecord:
-    with Session(engine) as session:
-        fr = FileRecord(
-            patient_id=patient_id,
-            file_key=file_key,
-            filename=filename,
-            wrapped_dek=wrapped_dek,
-        )
-        session.add(fr)
-        session.commit()
-        session.refresh(fr)
-        return fr
-
-
-def get_file_record(file_id: int) -> Optional[FileRecord]:
-    with Session(engine) as session:
-        return session.get(FileRecord, file_id)
-
-
-def list_files_for_patient(patient_id: int, limit: int = 100, offset: int = 0) -> List[FileRecord]:
-    with Session(engine) as session:
-        statement = (
-            select(FileRecord)
-            .where(FileRecord.patient_id == patient_id)
-            .offset(offset)
-            .limit(limit)
-        )
-        return session.exec(statement).all()
+    fr = FileRecord(
+        patient_id=patient_id,
+        file_key=file_key,
+        filename=filename,
+        wrapped_dek=wrapped_dek,
+        key_version=key_version,
+    )
+    session.add(fr)
+    await stats.bump(session, stats.file_deltas([(patient_id, fr.uploaded_at)]))
+    await session.commit()
+    await cache.invalidate(cache.patient_files_ns(patient_id))
+    return fr
+
+
+async def create_file_records(session: AsyncSession, rows: List[Dict[str, Any]]) -> List[FileRecord]:
+    """
+    Insert many FileRecords in one transaction (executemany with RETURNING).
+    Records come back in the order of `rows`.
+    """
+    statement = insert(FileRecord).returning(FileRecord, sort_by_parameter_order=True)
+    recs = (await session.scalars(statement, rows)).all()
+    await stats.bump(session, stats.file_deltas((r.patient_id, r.uploaded_at) for r in recs))
+    await session.commit()
+    await cache.invalidate(*{cache.patient_files_ns(r["patient_id"]) for r in rows})
+    return recs
+
+
+async def get_file_record(session: AsyncSession, file_id: int) -> Optional[FileRecord]:
+    return await session.get(FileRecord, file_id)
+
+
+async def list_files_for_patient(
+    session: AsyncSession, patient_id: int, limit: int = 100, after: Optional[Tuple] = None
+) -> Tuple[List[FileRecord], Optional[Tuple]]:
+    """
+    Page of a patient's files ordered by (uploaded_at, id), after the given key.
+    """
+    statement = select(FileRecord).where(FileRecord.patient_id == patient_id)
+    return await _keyset_page(session, statement, [FileRecord.uploaded_at, FileRecord.id], limit, after)
+
+
+async def delete_file_record(session: AsyncSession, file_id: int) -> bool:
+    rec = await session.get(FileRecord, file_id)
+    if not rec:
+        return False
+    await session.delete(rec)
+    await stats.bump(session, stats.file_deltas([(rec.patient_id, rec.uploaded_at)], sign=-1))
+    await session.commit()
+    await cache.invalidate(cache.patient_files_ns(rec.patient_id))
+    return True
 
 
-def delete_file_record(file_id: int) -> bool:
-    with Session(engine) as session:
-        rec = session.get(FileRecord, file_id)
-        if not rec:
-            return False
-        session.delete(rec)
-        session.commit()
-        return True
+# -------------------------
+# APPOINTMENT HELPERS
+# -------------------------
+async def create_appointment(session: AsyncSession, **data) -> Appointment:
+    appt = Appointment(**data)
+    session.add(appt)
+    await session.commit()
+    return appt
+
+
+async def get_appointment(session: AsyncSession, appointment_id: int) -> Optional[Appointment]:
+    return await session.get(Appointment, appointment_id)
+
+
+async def update_appointment(session: AsyncSession, appt: Appointment, **changes) -> Appointment:
+    for k, v in changes.items():
+        setattr(appt, k, v)
+    session.add(appt)
+    await session.commit()
+    return appt
+
+
+async def find_appointment_conflicts(
+    session: AsyncSession,
+    doctor_id: str,
+    start_at: datetime,
+    end_at: datetime,
+    exclude_id: Optional[int] = None,
+) -> List[int]:
+    """
+    Ids of the doctor's active appointments overlapping [start_at, end_at).
+    No booking is longer than APPOINTMENT_MAX_MINUTES, so only starts in
+    (start_at - max, end_at) can overlap: one range scan on (doctor_id, start_at).
+    """
+    statement = select(Appointment.id).where(
+        Appointment.doctor_id == doctor_id,
+        Appointment.start_at > start_at - timedelta(minutes=settings.APPOINTMENT_MAX_MINUTES),
+        Appointment.start_at < end_at,
+        Appointment.end_at > start_at,
+        Appointment.status != "cancelled",
+    )
+    if exclude_id is not None:
+        statement = statement.where(Appointment.id != exclude_id)
+    return list((await session.exec(statement)).all())
+
+
+async def list_doctor_appointments(
+    session: AsyncSession,
+    doctor_id: str,
+    since: datetime,
+    until: datetime,
+    include_cancelled: bool = False,
+) -> List[Appointment]:
+    """
+    A doctor's appointments starting in [since, until), in start order.
+    """
+    statement = select(Appointment).where(
+        Appointment.doctor_id == doctor_id,
+        Appointment.start_at >= since,
+        Appointment.start_at < until,
+    )
+    if not include_cancelled:
+        statement = statement.where(Appointment.status != "cancelled")
+    return list((await session.exec(statement.order_by(Appointment.start_at, Appointment.id))).all())
+
+
+async def list_booked_intervals(
+    session: AsyncSession, doctor_ids: List[str], ending_after: datetime
+) -> List[Tuple[str, int, datetime, datetime]]:
+    """
+    (doctor_id, id, start_at, end_at) of every active appointment of these
+    doctors that ends after `ending_after`, in one query.
+    """
+    statement = select(Appointment.doctor_id, Appointment.id, Appointment.start_at, Appointment.end_at).where(
+        Appointment.doctor_id.in_(doctor_ids),
+        Appointment.start_at > ending_after - timedelta(minutes=settings.APPOINTMENT_MAX_MINUTES),
+        Appointment.end_at > ending_after,
+        Appointment.status != "cancelled",
+    )
+    return [tuple(r) for r in (await session.exec(statement)).all()]
+
+
+async def list_doctor_ids(session: AsyncSession, doctor_ids: Optional[List[str]] = None) -> List[str]:
+    """
+    Ids of doctor accounts; restricted to (and in the order of) `doctor_ids` if given.
+    """
+    statement = select(User.id).where(User.role == "doctor")
+    if doctor_ids is not None:
+        found = set((await session.exec(statement.where(User.id.in_(doctor_ids)))).all())
+        return [d for d in dict.fromkeys(doctor_ids) if d in found]
+    return list((await session.exec(statement)).all())
 
 
 # -------------------------
 # AUDIT LOG HELPERS
 # -------------------------
-def create_audit_log(
+async def create_audit_log(
+    session: AsyncSession,
     actor_id: Optional[str],
     actor_role: Optional[str],
     action: str,
@@ -146,22 +425,56 @@ def create_audit_log(
     target_id: Optional[str] = None,
     summary: Optional[str] = None,
 ) -> AuditLog:
-    with Session(engine) as session:
-        log = AuditLog(
-            actor_id=actor_id,
-            actor_role=actor_role,
-            action=action,
-            target_type=target_type,
-            target_id=target_id,
-            summary=summary,
-        )
-        session.add(log)
-        session.commit()
-        session.refresh(log)
-        return log
-
-
-def list_audit_logs(limit: int = 100, offset: int = 0) -> List[AuditLog]:
-    with Session(engine) as session:
-        statement = select(AuditLog).offset(offset).limit(limit)
-        return session.exec(statement).all()
+    log = AuditLog(
+        actor_id=actor_id,
+        actor_role=actor_role,
+        action=action,
+        target_type=target_type,
+        target_id=target_id,
+        summary=summary,
+    )
+    session.add(log)
+    await session.commit()
+    return log
+
+
+async def get_audit_log(session: AsyncSession, log_id: int) -> Optional[AuditLog]:
+    return await session.get(AuditLog, log_id)
+
+
+async def list_audit_logs(
+    session: AsyncSession,
+    limit: int = 100,
+    after: Optional[Tuple] = None,
+    actor_id: Optional[str] = None,
+    action: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    descending: bool = False,
+) -> Tuple[List[AuditLog], Optional[Tuple]]:
+    """
+    Page of audit logs ordered by (timestamp, id), after the given key.
+
+    Equality filters line up with the composite indexes (actor_id, timestamp, id),
+    (action, timestamp, id) and (target_type, target_id, timestamp, id), so a
+    filtered, time-bounded page is a single index range scan. `since` is
+    inclusive, `until` exclusive.
+    """
+    statement = select(AuditLog)
+    if actor_id is not None:
+        statement = statement.where(AuditLog.actor_id == actor_id)
+    if action is not None:
+        statement = statement.where(AuditLog.action == action)
+    if target_type is not None:
+        statement = statement.where(AuditLog.target_type == target_type)
+    if target_id is not None:
+        statement = statement.where(AuditLog.target_id == target_id)
+    if since is not None:
+        statement = statement.where(AuditLog.timestamp >= since)
+    if until is not None:
+        statement = statement.where(AuditLog.timestamp < until)
+    return await _keyset_page(
+        session, statement, [AuditLog.timestamp, AuditLog.id], limit, after, descending
+    )
@@ -1,24 +1,107 @@
 # app/db.py
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .config import settings
+from .services.schedule import ensure_schedule_constraints
+from .services.search import ensure_search_index
 
-# Use echo=True during early dev for SQL logs; set to False later
-engine = create_engine(settings.DATABASE_URL, echo=True, pool_pre_ping=True)
+# async driver to use for each sync dialect in DATABASE_URL
+_ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def _engine_kwargs(url: str, is_async: bool = False) -> dict:
+    kwargs = {"echo": settings.DB_ECHO, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    # in-memory SQLite uses a single shared connection; pool sizing does not apply
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith("sqlite:")):
+        return kwargs
+    if is_async and url.startswith("sqlite"):
+        # aiosqlite defaults to NullPool (a new thread + connection + pragmas per checkout)
+        kwargs["poolclass"] = AsyncAdaptedQueuePool
+    kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    return kwargs
+
+
+def async_database_url() -> str:
+    """
+    ASYNC_DATABASE_URL if set, else DATABASE_URL with its driver swapped for
+    the asyncio one (sqlite -> aiosqlite, postgresql/psycopg2 -> asyncpg).
+    """
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    backend = "postgresql" if url.get_backend_name() in ("postgres", "postgresql") else url.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise RuntimeError(f"No async driver known for {backend!r}; set ASYNC_DATABASE_URL")
+    return url.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+# Sync engine: init_db, Alembic-adjacent scripts and batch jobs
+engine = create_engine(settings.DATABASE_URL, **_engine_kwargs(settings.DATABASE_URL))
+
+# Async engine: all request handlers, so DB waits don't occupy threadpool workers
+async_engine = create_async_engine(
+    async_database_url(), **_engine_kwargs(settings.DATABASE_URL, is_async=True)
+)
+async_session_factory = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):
+        """
+        WAL lets readers run alongside the writer; NORMAL sync is durable in WAL mode
+        except on power loss; busy_timeout waits for the write lock instead of failing.
+        """
+        cur = dbapi_conn.cursor()
+        if settings.SQLITE_WAL:
+            cur.execute("PRAGMA journal_mode=WAL")
+            cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cur.execute(f"PRAGMA cache_size={-int(settings.SQLITE_CACHE_KB)}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
 
 
 def get_session():
     """
-    Use this helper as a dependency in FastAPI routes:
-        with get_session() as session:
-            ...
-    Or use dependency injection by wrapping yield if you want DI.
+    Sync Session for scripts and any remaining sync code paths.
     """
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
 
+async def get_async_session():
+    """
+    Request-scoped unit of work. FastAPI caches dependencies per request, so
+    auth and the route handler share this one AsyncSession (one pool checkout):
+
+        async def route(session: AsyncSession = Depends(get_async_session)):
+            await crud.get_patient(session, patient_id)
+    """
+    async with async_session_factory() as session:
+        yield session
+
+
+async def close_db():
+    await async_engine.dispose()
+
+
 def init_db():
     """
     Create DB tables. Call on startup.
     """
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        ensure_search_index(conn)
+        ensure_schedule_constraints(conn)
@@ -6,5 +6,5 @@ from app.db import get_session
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def get_db():
-    return next(get_session())
+    yield from get_session()
 
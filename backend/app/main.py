@@ -3,10 +3,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.db import init_db
+from app.db import init_db, close_db
+from app.services import crypto
+from app.services import audit_archive
+from app.services.cache import close_cache
+from app.services.audit_writer import audit_writer
+from app.services.passwords import close_password_pool
+from app.services.storage import close_storage
 
 # Routers
-from app.routes import patients, files, audit
+from app.routes import patients, files, appointments, audit, metrics, stats
 from app import auth
 
 
@@ -39,8 +45,24 @@ app.add_middleware(
 # 🔥 STARTUP
 # -------------------------
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    # build the master Fernet once instead of on every wrap/unwrap
+    if settings.MASTER_FERNET_KEY:
+        crypto.init_master_key()
+    # Postgres: make sure this and the next months' audit partitions exist
+    await audit_archive.ensure_partitions()
+    # replays any spooled audit events, then flushes in the background
+    await audit_writer.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await audit_writer.stop()
+    close_storage()
+    close_password_pool()
+    await close_cache()
+    await close_db()
 
 # -------------------------
 # 🔥 ROUTES
@@ -48,7 +70,10 @@ def on_startup():
 app.include_router(auth.router)
 app.include_router(patients.router)
 app.include_router(files.router)
+app.include_router(appointments.router)
 app.include_router(audit.router)
+app.include_router(metrics.router)
+app.include_router(stats.router)
 
 # -------------------------
 # 🔥 ROOT ENDPOINT
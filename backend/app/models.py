@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 import datetime
 import uuid
@@ -17,6 +18,7 @@ class User(SQLModel, table=True):
     hashed_password: str
     full_name: Optional[str] = None
     role: Optional[str] = Field(default="doctor")  # "doctor" or "admin"
+    token_version: int = Field(default=0)  # bump to revoke every token issued so far
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
 
     # Relationships
@@ -27,6 +29,10 @@ class User(SQLModel, table=True):
 # PATIENT
 # -------------------------
 class Patient(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_patient_created_at_id", "created_at", "id"),  # keyset pagination
+    )
+
     id: int = Field(default=None, primary_key=True)
     name: str
     age: Optional[int] = None
@@ -41,6 +47,7 @@ class Patient(SQLModel, table=True):
     current_medications: Optional[str] = None
 
     created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+    updated_at: Optional[datetime.datetime] = None  # set on every update; feeds the ETag
 
     # Reverse relations
     files: List["FileRecord"] = Relationship(back_populates="patient")
@@ -51,11 +58,16 @@ class Patient(SQLModel, table=True):
 # FILERECORD
 # -------------------------
 class FileRecord(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_filerecord_patient_uploaded_id", "patient_id", "uploaded_at", "id"),  # keyset pagination
+    )
+
     id: int = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patient.id")
     file_key: str
     filename: str
     wrapped_dek: Optional[str] = None
+    key_version: int = Field(default=1)  # master key version that wrapped the DEK
     uploaded_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
 
     # Reverse relation
@@ -66,6 +78,11 @@ class FileRecord(SQLModel, table=True):
 # APPOINTMENT
 # -------------------------
 class Appointment(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_appointment_doctor_start", "doctor_id", "start_at"),  # conflicts, doctor's day
+        Index("ix_appointment_patient_start", "patient_id", "start_at"),  # patient chart
+    )
+
     id: int = Field(default=None, primary_key=True)
 
     patient_id: int = Field(foreign_key="patient.id")
@@ -86,6 +103,14 @@ class Appointment(SQLModel, table=True):
 # AUDIT LOG
 # -------------------------
 class AuditLog(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_auditlog_timestamp_id", "timestamp", "id"),  # keyset pagination
+        # audit query filters, each followed by the keyset columns
+        Index("ix_auditlog_actor_timestamp_id", "actor_id", "timestamp", "id"),
+        Index("ix_auditlog_action_timestamp_id", "action", "timestamp", "id"),
+        Index("ix_auditlog_target_timestamp_id", "target_type", "target_id", "timestamp", "id"),
+    )
+
     id: int = Field(default=None, primary_key=True)
     actor_id: Optional[str] = Field(default=None)
     actor_role: Optional[str] = None
@@ -94,3 +119,41 @@ class AuditLog(SQLModel, table=True):
     target_id: Optional[str] = None
     timestamp: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
     summary: Optional[str] = None
+
+
+# -------------------------
+# AUDIT ARCHIVE
+# -------------------------
+class AuditArchive(SQLModel, table=True):
+    """
+    One compacted month of audit history: an encrypted Parquet object in storage.
+    A month can have several archives if late events arrived after compaction.
+    """
+    id: int = Field(default=None, primary_key=True)
+    period_start: datetime.datetime = Field(index=True)  # inclusive, first of the month (UTC)
+    period_end: datetime.datetime  # exclusive
+    object_key: str
+    row_count: int
+    min_id: Optional[int] = None
+    max_id: Optional[int] = None
+    size_bytes: int
+    wrapped_dek: str
+    key_version: int = Field(default=1)
+    created_at: datetime.datetime = Field(default_factory=datetime.datetime.utcnow)
+
+
+# -------------------------
+# STAT COUNTERS
+# -------------------------
+class StatCounter(SQLModel, table=True):
+    """
+    Pre-aggregated dashboard counters (see services/stats.py), kept current by
+    the write paths and rebuildable from the base tables.
+    """
+    __table_args__ = (
+        Index("ix_statcounter_metric_value", "metric", "value"),  # top-N per metric
+    )
+
+    metric: str = Field(primary_key=True)
+    key: str = Field(default="", primary_key=True)
+    value: int = Field(default=0)
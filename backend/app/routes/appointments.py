@@ -0,0 +1,242 @@
+# app/routes/appointments.py
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Awaitable, Callable, List, Optional
+from datetime import date, datetime, time, timedelta, timezone
+
+from app import crud, schemas
+from app.auth import get_current_user
+from app.config import settings
+from app.db import get_async_session
+from app.models import Appointment
+from app.routes.audit import log_action
+from app.services import schedule
+from app.services.schedule import schedule_index
+
+router = APIRouter(prefix="/appointments", tags=["appointments"])
+
+
+def _utc(value: datetime) -> datetime:
+    # timestamps are stored as naive UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _interval(start_at: datetime, end_at: Optional[datetime], default: timedelta):
+    start = _utc(start_at)
+    end = _utc(end_at) if end_at else start + default
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end_at must be after start_at")
+    if end - start > timedelta(minutes=settings.APPOINTMENT_MAX_MINUTES):
+        raise HTTPException(
+            status_code=400, detail=f"Appointments are limited to {settings.APPOINTMENT_MAX_MINUTES} minutes"
+        )
+    return start, end
+
+
+def _duration(minutes: int) -> timedelta:
+    if not 0 < minutes <= settings.APPOINTMENT_MAX_MINUTES:
+        raise HTTPException(status_code=400, detail="Invalid duration_minutes")
+    return timedelta(minutes=minutes)
+
+
+def _conflict(ids: List[int]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"message": "Doctor already booked at that time", "conflicts": ids},
+    )
+
+
+async def _book(
+    session: AsyncSession,
+    doctor_id: str,
+    start: datetime,
+    end: datetime,
+    write: Callable[[], Awaitable[Appointment]],
+    exclude_id: Optional[int] = None,
+) -> Appointment:
+    """
+    Run `write` only if the doctor is free over [start, end). The in-memory index
+    rejects known clashes without a query; the database has the final say.
+    """
+    async with schedule_index.lock(doctor_id):
+        booked = await schedule_index.get(session, doctor_id)
+        clash = booked.conflicts(start, end, exclude_id)
+        if not clash:
+            clash = await crud.find_appointment_conflicts(session, doctor_id, start, end, exclude_id)
+            if clash:
+                # booked by another worker since this index was loaded
+                schedule_index.invalidate(doctor_id)
+        if clash:
+            raise _conflict(clash)
+        try:
+            appt = await write()
+        except IntegrityError:
+            # Postgres exclusion constraint: lost a race with another worker
+            await session.rollback()
+            schedule_index.invalidate(doctor_id)
+            raise _conflict([])
+        if exclude_id is not None:
+            booked.remove(exclude_id)
+        booked.add(appt.id, appt.start_at, appt.end_at)
+        return appt
+
+
+# ============================================================
+# 📌 BOOK / RESCHEDULE / CANCEL
+# ============================================================
+@router.post("/", response_model=schemas.AppointmentRead, status_code=status.HTTP_201_CREATED)
+async def create_appointment(
+    payload: schemas.AppointmentCreate,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Book an appointment; 409 if the doctor already has one overlapping it.
+    """
+    default = timedelta(minutes=settings.APPOINTMENT_DEFAULT_MINUTES)
+    start, end = _interval(payload.start_at, payload.end_at, default)
+    if not await crud.patient_exists(session, payload.patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    if not await crud.doctor_exists(session, payload.doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+
+    appt = await _book(
+        session, payload.doctor_id, start, end,
+        lambda: crud.create_appointment(
+            session,
+            patient_id=payload.patient_id,
+            doctor_id=payload.doctor_id,
+            start_at=start,
+            end_at=end,
+            notes=payload.notes,
+        ),
+    )
+    log_action(current_user, "appointment.create", "appointment", appt.id)
+    return appt
+
+
+@router.post("/{appointment_id}/reschedule", response_model=schemas.AppointmentRead)
+async def reschedule_appointment(
+    appointment_id: int,
+    payload: schemas.AppointmentReschedule,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    appt = await crud.get_appointment(session, appointment_id)
+    if not appt:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    if appt.status == "cancelled":
+        raise HTTPException(status_code=400, detail="Appointment is cancelled")
+
+    length = appt.end_at - appt.start_at if appt.end_at else timedelta(minutes=settings.APPOINTMENT_DEFAULT_MINUTES)
+    start, end = _interval(payload.start_at, payload.end_at, length)
+
+    def write():
+        return crud.update_appointment(session, appt, start_at=start, end_at=end)
+
+    if appt.doctor_id:
+        appt = await _book(session, appt.doctor_id, start, end, write, exclude_id=appt.id)
+    else:
+        appt = await write()
+    log_action(current_user, "appointment.reschedule", "appointment", appointment_id)
+    return appt
+
+
+@router.post("/{appointment_id}/cancel", response_model=schemas.AppointmentRead)
+async def cancel_appointment(
+    appointment_id: int,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    appt = await crud.get_appointment(session, appointment_id)
+    if not appt:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    if appt.status != "cancelled":
+        appt = await crud.update_appointment(session, appt, status="cancelled")
+        if appt.doctor_id:
+            (await schedule_index.get(session, appt.doctor_id)).remove(appt.id)
+        log_action(current_user, "appointment.cancel", "appointment", appointment_id)
+    return appt
+
+
+# ============================================================
+# 📌 AVAILABILITY
+# ============================================================
+@router.get("/first-available", response_model=schemas.FirstAvailableSlot)
+async def first_available(
+    doctor_id: Optional[List[str]] = Query(None),
+    duration_minutes: int = settings.APPOINTMENT_DEFAULT_MINUTES,
+    not_before: Optional[datetime] = None,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Earliest free slot of `duration_minutes` among the given doctors (repeat
+    `doctor_id`; default: every doctor) within SCHEDULE_SEARCH_DAYS, during
+    bookable hours. Ties go to the doctor listed first.
+    """
+    duration = _duration(duration_minutes)
+    since = max(_utc(not_before), datetime.utcnow()) if not_before else datetime.utcnow()
+    until = since + timedelta(days=settings.SCHEDULE_SEARCH_DAYS)
+    doctor_ids = await crud.list_doctor_ids(session, doctor_id)
+
+    best = None
+    for d, booked in (await schedule_index.get_many(session, doctor_ids)).items():
+        # anything found later than the best so far is useless: shrink the window
+        start = schedule.first_free(booked, since, best[1] + duration if best else until, duration)
+        if start is not None and (best is None or start < best[1]):
+            best = (d, start)
+    if best is None:
+        raise HTTPException(status_code=404, detail="No free slot in the search window")
+    return {"doctor_id": best[0], "start_at": best[1], "end_at": best[1] + duration}
+
+
+@router.get("/doctor/{doctor_id}", response_model=List[schemas.AppointmentRead])
+async def doctor_day(
+    doctor_id: str,
+    day: date,
+    include_cancelled: bool = False,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    A doctor's appointments starting on `day` (UTC), in start order.
+    """
+    since = datetime.combine(day, time())
+    return await crud.list_doctor_appointments(
+        session, doctor_id, since, since + timedelta(days=1), include_cancelled
+    )
+
+
+@router.get("/doctor/{doctor_id}/free-slots", response_model=List[schemas.TimeSlot])
+async def doctor_free_slots(
+    doctor_id: str,
+    day: date,
+    duration_minutes: int = settings.APPOINTMENT_DEFAULT_MINUTES,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Free stretches of at least `duration_minutes` in the doctor's bookable hours
+    on `day` (UTC); past time is never offered.
+    """
+    duration = _duration(duration_minutes)
+    if not await crud.doctor_exists(session, doctor_id):
+        raise HTTPException(status_code=404, detail="Doctor not found")
+    since = max(datetime.combine(day, time()), datetime.utcnow())
+    until = datetime.combine(day, time()) + timedelta(days=1)
+    booked = await schedule_index.get(session, doctor_id)
+    return [{"start_at": s, "end_at": e} for s, e in schedule.free_slots(booked, since, until, duration)]
+
+
+@router.get("/{appointment_id}", response_model=schemas.AppointmentRead)
+async def get_appointment(
+    appointment_id: int,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    appt = await crud.get_appointment(session, appointment_id)
+    if not appt:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    return appt
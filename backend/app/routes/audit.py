@@ -1,48 +1,90 @@
 # app/routes/audit.py
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+from datetime import datetime
 
-from app import crud, schemas
+from app import schemas
 from app.auth import require_admin, get_current_user
+from app.db import get_async_session
+from app.services import audit_archive
+from app.services.audit_writer import audit_writer
+from app.utils import page_size, cursor_key, next_cursor
 
 router = APIRouter(prefix="/audit", tags=["audit"])
 
 
-@router.get("/", response_model=List[schemas.AuditLogRead])
-def list_audit_logs(limit: int = 200, offset: int = 0, current_user=Depends(get_current_user)):
+@router.get("/", response_model=schemas.AuditLogPage)
+async def list_audit_logs(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    actor_id: Optional[str] = None,
+    action: Optional[str] = None,
+    target_type: Optional[str] = None,
+    target_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    newest_first: bool = False,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
     """
-    List audit logs. Only admin users can access this endpoint.
+    Query audit logs, one keyset page at a time (oldest first unless `newest_first`).
+    Months already compacted into archives are included transparently.
+    Filter by `actor_id`, `action`, `target_type`/`target_id` and a `since` (inclusive)
+    / `until` (exclusive) timestamp range; keep the same filters when following
+    `next_cursor`. Only admin users can access this endpoint.
     """
     # require_admin will raise 403 if not admin
     require_admin(current_user)
 
-    return crud.list_audit_logs(limit=limit, offset=offset)
+    try:
+        items, key = await audit_archive.list_audit_logs(
+            session,
+            limit=page_size(limit),
+            after=cursor_key(cursor),
+            actor_id=actor_id,
+            action=action,
+            target_type=target_type,
+            target_id=target_id,
+            since=since,
+            until=until,
+            descending=newest_first,
+        )
+    except audit_archive.ArchiveUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor(key)}
 
 
 @router.get("/{log_id}", response_model=schemas.AuditLogRead)
-def get_audit_log(log_id: int, current_user=Depends(get_current_user)):
+async def get_audit_log(
+    log_id: int,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
     """
     Get single audit log by id (admin only).
     """
     require_admin(current_user)
-    logs = crud.list_audit_logs(limit=1, offset=0)
-    # crud currently doesn't have get_audit_log; we can fetch the list and filter
-    for l in logs:
-        if l.id == log_id:
-            return l
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audit log not found")
-
-def log_action(db, actor_id, actor_role, action, target_type=None, target_id=None, summary=None):
-    from app import models
-    entry = models.AuditLog(
-        actor_id=actor_id,
-        actor_role=actor_role,
-        action=action,
+    try:
+        log = await audit_archive.get_audit_log(session, log_id)
+    except audit_archive.ArchiveUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not log:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audit log not found")
+    return log
+
+
+def log_action(actor, action, target_type=None, target_id=None, summary=None):
+    """
+    Queue an audit event for `actor` (a User or Principal, or None if unauthenticated).
+    Returns immediately; the batched writer persists it in the background.
+    """
+    audit_writer.record(
+        action,
+        actor_id=getattr(actor, "id", None),
+        actor_role=getattr(actor, "role", None),
         target_type=target_type,
-        target_id=str(target_id) if target_id else None,
+        target_id=target_id,
         summary=summary,
     )
-    db.add(entry)
-    db.commit()
-    db.refresh(entry)
-    return entry
@@ -1,20 +1,88 @@
 # backend/app/routes/files.py
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Form
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Form, Header
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List
-from io import BytesIO
+from datetime import datetime, timedelta
+import asyncio
+import logging
 import uuid
 import mimetypes
+import jwt
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app import crud, schemas
-from app.auth import get_current_user
-from app.services import b2_client, crypto
+from app.auth import get_current_user, SECRET_KEY, ALGORITHM
+from app.db import get_async_session
+from app.routes.audit import log_action
+from app.services import cache, crypto
+from app.services.dek_cache import dek_cache
+from app.services.storage import get_storage
 from app.config import settings
+from app.utils import (
+    parse_range_header, page_size, cursor_key, next_cursor,
+    make_etag, json_etag, etag_matches, if_range_allows,
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 
+# ============================================================
+# 📌 SHARED: ENCRYPT + STORE ONE UPLOAD
+# ============================================================
+async def _encrypt_and_store(file: UploadFile, patient_id: int, first: bytes) -> dict:
+    """
+    Encrypt an upload chunk by chunk and stream it into storage.
+    Returns the FileRecord column values; raises HTTPException on storage failure.
+    """
+    # 1) Create DEK
+    dek = crypto.generate_dek()
+
+    # 2) Wrap DEK
+    wrapped_dek = crypto.wrap_dek(dek)
+
+    # 3) Create storage object key
+    file_key = f"patients/{patient_id}/{uuid.uuid4()}-{file.filename}"
+
+    # 4) Encrypt slab by slab on the worker pool (AES-GCM releases the GIL) and push
+    #    parts to storage as they fill up, so memory stays bounded by the part size
+    encryptor = crypto.StreamEncryptor(dek)
+    writer = get_storage().open_writer(file_key, content_type="application/octet-stream")
+    try:
+        await writer.write(encryptor.header)
+        chunk = first
+        while chunk:
+            await writer.write(await run_in_threadpool(encryptor.update, chunk))
+            chunk = await file.read(settings.UPLOAD_READ_SIZE)
+        await writer.write(encryptor.finalize())
+        await writer.close()
+    except Exception as e:
+        await writer.abort()
+        raise HTTPException(status_code=500, detail=f"Failed uploading to storage: {e}")
+
+    return {
+        "patient_id": patient_id,
+        "file_key": file_key,
+        "filename": file.filename,
+        "wrapped_dek": wrapped_dek,
+        "key_version": crypto.current_key_version(),
+    }
+
+
+async def _delete_quietly(keys: List[str]) -> None:
+    """
+    Best-effort removal of objects whose metadata could not be saved.
+    """
+    storage = get_storage()
+    results = await asyncio.gather(*(storage.delete(k) for k in keys), return_exceptions=True)
+    for key, res in zip(keys, results):
+        if isinstance(res, Exception):
+            logger.warning("Failed to clean up orphaned object %s: %s", key, res)
+
+
 # ============================================================
 # 📌 UPLOAD FILE
 # ============================================================
@@ -23,155 +91,567 @@ async def upload_file(
     patient_id: int = Form(...),
     file: UploadFile = File(...),
     current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    raw = await file.read()
-    if not raw:
+    first = await file.read(settings.UPLOAD_READ_SIZE)
+    if not first:
         raise HTTPException(status_code=400, detail="Empty file")
 
-    content_type = file.content_type or mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
+    row = await _encrypt_and_store(file, patient_id, first)
 
-    # 1) Create DEK
-    dek = crypto.generate_dek()
+    # 5) Save metadata
+    try:
+        rec = await crud.create_file_record(session, **row)
+    except Exception as e:
+        # cleanup in case metadata fails
+        await _delete_quietly([row["file_key"]])
+        raise HTTPException(status_code=500, detail=f"Failed saving metadata: {e}")
+
+    log_action(current_user, "file.upload", "file", rec.id, summary=rec.filename)
+    return rec
 
-    # 2) Encrypt file
-    encrypted = crypto.encrypt_aes_gcm(raw, dek)
 
-    # 3) Wrap DEK
+# ============================================================
+# 📌 BULK UPLOAD (many files, one or more patients)
+# ============================================================
+@router.post("/upload-batch", response_model=schemas.BatchUploadResult)
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    patient_id: Optional[int] = Form(None),
+    patient_ids: Optional[List[int]] = Form(None),
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Upload many files at once. Either send one `patient_id` for all files, or one
+    `patient_ids` entry per file (same order as `files`).
+
+    Files are encrypted and stored concurrently (bounded by UPLOAD_BATCH_CONCURRENCY)
+    and all FileRecords are inserted in a single transaction. The response reports
+    each file individually; objects whose metadata could not be saved are removed.
+    """
+    if len(files) > settings.UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.UPLOAD_BATCH_MAX_FILES} files per batch")
+    if patient_ids:
+        if len(patient_ids) != len(files):
+            raise HTTPException(status_code=400, detail="patient_ids must have one entry per file")
+        targets = patient_ids
+    elif patient_id is not None:
+        targets = [patient_id] * len(files)
+    else:
+        raise HTTPException(status_code=400, detail="patient_id or patient_ids is required")
+
+    known = await crud.existing_patient_ids(session, set(targets))
+    semaphore = asyncio.Semaphore(settings.UPLOAD_BATCH_CONCURRENCY)
+
+    async def _one(file: UploadFile, pid: int) -> dict:
+        result = {"filename": file.filename, "patient_id": pid, "ok": False}
+        if pid not in known:
+            return {**result, "error": "Patient not found"}
+        async with semaphore:
+            try:
+                first = await file.read(settings.UPLOAD_READ_SIZE)
+                if not first:
+                    return {**result, "error": "Empty file"}
+                return {**result, "row": await _encrypt_and_store(file, pid, first)}
+            except HTTPException as e:
+                return {**result, "error": e.detail}
+            except Exception as e:
+                logger.exception("Batch upload of %s failed", file.filename)
+                return {**result, "error": str(e)}
+
+    results = await asyncio.gather(*(_one(f, pid) for f, pid in zip(files, targets)))
+
+    # one transaction for all metadata rows
+    stored = [r for r in results if "row" in r]
+    if stored:
+        try:
+            recs = await crud.create_file_records(session, [r["row"] for r in stored])
+        except Exception as e:
+            logger.exception("Batch metadata insert failed")
+            await _delete_quietly([r["row"]["file_key"] for r in stored])
+            for r in stored:
+                r["error"] = f"Failed saving metadata: {e}"
+        else:
+            for r, rec in zip(stored, recs):
+                r["ok"] = True
+                r["file"] = rec
+
+    for r in results:
+        r.pop("row", None)
+    uploaded = sum(1 for r in results if r["ok"])
+    for r in results:
+        if r["ok"]:
+            log_action(current_user, "file.upload", "file", r["file"].id, summary=r["file"].filename)
+    return {"uploaded": uploaded, "failed": len(results) - uploaded, "results": results}
+
+
+# ============================================================
+# 📌 DIRECT-TO-STORAGE UPLOAD (browser encrypts, presigned parts)
+# ============================================================
+def _sign_upload_ticket(claims: dict) -> str:
+    expire = datetime.utcnow() + timedelta(seconds=settings.DIRECT_UPLOAD_EXPIRES_SECONDS)
+    return jwt.encode({**claims, "typ": "direct-upload", "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def _read_upload_ticket(token: str, current_user) -> dict:
+    try:
+        ticket = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=400, detail="Invalid or expired upload token")
+    if ticket.get("typ") != "direct-upload" or ticket.get("uid") != current_user.id:
+        raise HTTPException(status_code=400, detail="Invalid upload token")
+    return ticket
+
+
+async def _verify_direct_upload(ticket: dict) -> None:
+    """
+    Check the assembled object without downloading it: exact ciphertext size, the
+    header we issued, and an authenticated decrypt of the final chunk (which also
+    proves the stream is not truncated). Part checksums (ETags) were already
+    verified by the storage service on completion.
+    """
+    storage = get_storage()
+    header = crypto.decode_b64(ticket["hdr"])
+
+    body, size = await storage.open(ticket["key"], byte_range=(0, crypto.STREAM_HEADER_SIZE - 1))
+    try:
+        stored_header = await body.read()
+    finally:
+        await body.close()
+    if size != ticket["ct_size"]:
+        raise ValueError(f"Size mismatch: expected {ticket['ct_size']} bytes, got {size}")
+    if stored_header != header:
+        raise ValueError("Stream header mismatch")
+
+    chunk_size, _ = crypto.parse_stream_header(header)
+    sealed = chunk_size + crypto.STREAM_TAG_SIZE
+    last_index = -(-(size - crypto.STREAM_HEADER_SIZE) // sealed) - 1
+    tail_start = crypto.STREAM_HEADER_SIZE + last_index * sealed
+    body, _ = await storage.open(ticket["key"], byte_range=(tail_start, size - 1))
+    try:
+        tail = await body.read()
+    finally:
+        await body.close()
+
+    dek = crypto.unwrap_dek(ticket["wdek"])
+    dec = crypto.StreamDecryptor(dek, header=header, first_index=last_index)
+    dec.update(tail)
+    dec.finalize(last=True)
+
+
+@router.post("/direct-upload/init", response_model=schemas.DirectUploadTicket)
+async def init_direct_upload(
+    payload: schemas.DirectUploadInit,
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Phase 1: issue a DEK, a stream header and presigned multipart PUT URLs.
+    The browser encrypts with WebCrypto AES-GCM and uploads parts straight to storage.
+    """
+    if payload.size < 0:
+        raise HTTPException(status_code=400, detail="Invalid size")
+    if not await crud.patient_exists(session, payload.patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    dek = crypto.generate_dek()
     wrapped_dek = crypto.wrap_dek(dek)
+    header = crypto.new_stream_header()
+    ct_size = crypto.stream_ciphertext_size(payload.size)
+    # S3 allows at most 10,000 parts per upload
+    part_size = max(settings.UPLOAD_PART_SIZE, -(-ct_size // 10_000))
+    part_count = max(1, -(-ct_size // part_size))
+    file_key = f"patients/{payload.patient_id}/{uuid.uuid4()}-{payload.filename}"
+    expires_in = settings.DIRECT_UPLOAD_EXPIRES_SECONDS
+
+    storage = get_storage()
+    try:
+        upload_id = await storage.create_multipart(file_key, content_type="application/octet-stream")
+        urls = await asyncio.gather(*(
+            storage.presign_upload_part(file_key, upload_id, n, expires_in)
+            for n in range(1, part_count + 1)
+        ))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed preparing upload: {e}")
+
+    token = _sign_upload_ticket({
+        "uid": current_user.id,
+        "pid": payload.patient_id,
+        "key": file_key,
+        "upload_id": upload_id,
+        "name": payload.filename,
+        "wdek": wrapped_dek,
+        "kv": crypto.current_key_version(),
+        "hdr": crypto.encode_b64(header),
+        "ct_size": ct_size,
+    })
+    return {
+        "upload_token": token,
+        "file_key": file_key,
+        "dek": crypto.encode_b64(dek),
+        "header": crypto.encode_b64(header),
+        "chunk_size": crypto.STREAM_CHUNK_SIZE,
+        "part_size": part_size,
+        "ciphertext_size": ct_size,
+        "expires_in": expires_in,
+        "parts": [{"part_number": n, "url": url} for n, url in enumerate(urls, start=1)],
+    }
+
+
+@router.post(
+    "/direct-upload/complete",
+    response_model=schemas.FileRecordRead,
+    status_code=status.HTTP_201_CREATED,
+)
+async def complete_direct_upload(
+    payload: schemas.DirectUploadComplete,
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Phase 2: assemble the uploaded parts, verify the object, then create the FileRecord.
+    """
+    ticket = _read_upload_ticket(payload.upload_token, current_user)
+    storage = get_storage()
+    parts = [
+        {"ETag": p.etag, "PartNumber": p.part_number}
+        for p in sorted(payload.parts, key=lambda p: p.part_number)
+    ]
 
-    # 4) Create B2 object key
-    file_key = f"patients/{patient_id}/{uuid.uuid4()}-{file.filename}"
+    try:
+        await storage.complete_multipart(ticket["key"], ticket["upload_id"], parts)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed completing upload: {e}")
 
-    # 5) Upload encrypted file to B2
     try:
-        b2_client.upload_bytes(
-            bucket=settings.B2_BUCKET,
-            key=file_key,
-            data=encrypted,
-            content_type="application/octet-stream"
-        )
+        await _verify_direct_upload(ticket)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed uploading to storage: {e}")
+        await _delete_quietly([ticket["key"]])
+        raise HTTPException(status_code=400, detail=f"Uploaded object failed verification: {e}")
 
-    # 6) Save metadata
     try:
-        rec = crud.create_file_record(
-            patient_id=patient_id,
-            file_key=file_key,
-            filename=file.filename,
-            wrapped_dek=wrapped_dek
+        rec = await crud.create_file_record(
+            session,
+            patient_id=ticket["pid"],
+            file_key=ticket["key"],
+            filename=ticket["name"],
+            wrapped_dek=ticket["wdek"],
+            key_version=ticket["kv"],
         )
     except Exception as e:
-        # cleanup in case metadata fails
-        try:
-            b2_client.get_s3_client().delete_object(Bucket=settings.B2_BUCKET, Key=file_key)
-        except:
-            pass
+        await _delete_quietly([ticket["key"]])
         raise HTTPException(status_code=500, detail=f"Failed saving metadata: {e}")
 
+    log_action(current_user, "file.upload", "file", rec.id, summary=f"{rec.filename} (direct)")
     return rec
 
 
+@router.post("/direct-upload/abort", status_code=200)
+async def abort_direct_upload(payload: schemas.DirectUploadAbort, current_user = Depends(get_current_user)):
+    ticket = _read_upload_ticket(payload.upload_token, current_user)
+    try:
+        await get_storage().abort_multipart(ticket["key"], ticket["upload_id"])
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed aborting upload: {e}")
+    return {"ok": True, "message": "Upload aborted"}
+
+
 # ============================================================
-# 📌 DOWNLOAD FILE (attachment)
+# 📌 SHARED: STREAM DECRYPTED CONTENT
 # ============================================================
-@router.get("/{file_id}/download")
-def download_file(file_id: int, current_user = Depends(get_current_user)):
-    rec = crud.get_file_record(file_id)
-    if not rec:
-        raise HTTPException(status_code=404, detail="File not found")
+async def _stream_decrypted(body, decryptor, head: bytes = b""):
+    """
+    Push ciphertext from the storage body through a (range) decryptor, yielding
+    plaintext as each chunk authenticates, and always release the body.
+    """
+    try:
+        out = decryptor.update(head)
+        if out:
+            yield out
+        async for piece in body.iter_chunks(crypto.STREAM_CHUNK_SIZE + crypto.STREAM_TAG_SIZE):
+            out = decryptor.update(piece)
+            if out:
+                yield out
+        out = decryptor.finalize()
+        if out:
+            yield out
+    except Exception:
+        # headers are already sent; abort the response instead of sending bad bytes
+        logger.exception("Decryption failed mid-stream")
+        raise
+    finally:
+        await body.close()
+
+
+async def _ranged_response(rec, dek: bytes, media_type: str, headers: dict, range_header: str):
+    """
+    Serve a single byte range of the plaintext as 206 Partial Content by fetching
+    and decrypting only the chunks that cover it.
+    Returns None when the range should be ignored and the full body served instead.
+    """
+    storage = get_storage()
 
-    # Download encrypted bytes from B2
+    # 1) Fetch just the stream header (and learn the object size)
     try:
-        encrypted = b2_client.download_bytes(settings.B2_BUCKET, rec.file_key)
+        body, size = await storage.open(rec.file_key, byte_range=(0, crypto.STREAM_HEADER_SIZE - 1))
+        try:
+            header = await body.read()
+        finally:
+            await body.close()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed reading storage: {e}")
 
-    # Unwrap DEK + decrypt
+    # legacy single-shot objects can only be decrypted whole
+    if not crypto.is_stream_ciphertext(header):
+        return None
+
+    # 2) Map the plaintext range onto ciphertext chunks
     try:
-        dek = crypto.unwrap_dek(rec.wrapped_dek)
-        plaintext = crypto.decrypt_aes_gcm(encrypted, dek)
-    except Exception as e:
+        chunk_size, _ = crypto.parse_stream_header(header)
+        plain_size = crypto.stream_plaintext_size(size, chunk_size)
+    except ValueError as e:
         raise HTTPException(status_code=500, detail=f"Decryption failed: {e}")
+    try:
+        span = parse_range_header(range_header, plain_size)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{plain_size}"},
+        )
+    if span is None:
+        return None
+    start, end = span
+    ct_start, ct_end = crypto.stream_range_span(start, end, header, size)
+
+    # 3) Ranged get of the covering chunks, decrypt, trim to the requested bytes
+    try:
+        body, _ = await storage.open(rec.file_key, byte_range=(ct_start, ct_end))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed reading storage: {e}")
+    decryptor = crypto.StreamRangeDecryptor(dek, header, start, end, size)
 
     return StreamingResponse(
-        BytesIO(plaintext),
-        media_type="application/octet-stream",
-        headers={"Content-Disposition": f'attachment; filename="{rec.filename}"'}
+        _stream_decrypted(body, decryptor),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers={
+            **headers,
+            "Content-Range": f"bytes {start}-{end}/{plain_size}",
+            "Content-Length": str(end - start + 1),
+        }
     )
 
 
+def _file_etag(rec) -> str:
+    # objects are write-once under a unique key, so id + key pin the ciphertext
+    # (key rotation rewraps the DEK but leaves the object untouched)
+    return make_etag("file", rec.id, rec.file_key)
+
+
+async def _decrypted_response(
+    rec,
+    media_type: str,
+    disposition: str,
+    range_header: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+    if_range: Optional[str] = None,
+) -> Response:
+    """
+    Open the encrypted object and return a StreamingResponse that decrypts it
+    chunk by chunk. Memory per request is bounded by one encryption chunk.
+    A single `Range` is honoured with 206 Partial Content for stream-format objects
+    (unless an If-Range validator no longer matches). A matching If-None-Match
+    gets 304 before storage is touched.
+    """
+    validators = {
+        "ETag": _file_etag(rec),
+        "Cache-Control": f"private, max-age={settings.HTTP_FILE_MAX_AGE_SECONDS}, immutable",
+    }
+    if etag_matches(if_none_match, validators["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators)
+
+    # 1) Unwrap DEK
+    try:
+        dek = dek_cache.get_dek(rec.id, rec.wrapped_dek)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Decryption failed: {e}")
+
+    headers = {
+        **validators,
+        "Content-Disposition": f'{disposition}; filename="{rec.filename}"',
+        "Accept-Ranges": "bytes",
+    }
+    if range_header and if_range_allows(if_range, validators["ETag"]):
+        ranged = await _ranged_response(rec, dek, media_type, headers, range_header)
+        if ranged is not None:
+            return ranged
+
+    # 2) Open encrypted object in storage
+    try:
+        body, size = await get_storage().open(rec.file_key)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed reading storage: {e}")
+
+    # 3) Content-Length comes from the stream framing; legacy objects are buffered
+    try:
+        head = await body.read(crypto.STREAM_HEADER_SIZE)
+        if crypto.is_stream_ciphertext(head):
+            chunk_size, _ = crypto.parse_stream_header(head)
+            length = crypto.stream_plaintext_size(size, chunk_size)
+            content = _stream_decrypted(body, crypto.StreamDecryptor(dek), head)
+        else:
+            plaintext = crypto.decrypt_aes_gcm(head + await body.read(), dek)
+            await body.close()
+            length = len(plaintext)
+            content = iter([plaintext])
+            headers["Accept-Ranges"] = "none"
+    except Exception as e:
+        await body.close()
+        raise HTTPException(status_code=500, detail=f"Decryption failed: {e}")
+
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
+
+def _audit_access(current_user, action: str, file_id: int, resp: Response) -> None:
+    """
+    Audit a disclosure of a file's contents once per access. Revalidations (304)
+    and follow-up range fetches (PDF.js, <video> seeking) re-read what the
+    first, offset-0 request already disclosed, so they are not logged again.
+    """
+    if resp.status_code == status.HTTP_304_NOT_MODIFIED:
+        return
+    if resp.status_code == status.HTTP_206_PARTIAL_CONTENT and not resp.headers["Content-Range"].startswith("bytes 0-"):
+        return
+    log_action(current_user, action, "file", file_id)
+
+
+# ============================================================
+# 📌 DOWNLOAD FILE (attachment)
+# ============================================================
+@router.get("/{file_id}/download")
+async def download_file(
+    file_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    rec = await crud.get_file_record(session, file_id)
+    if not rec:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    resp = await _decrypted_response(
+        rec, "application/octet-stream", "attachment", range_header, if_none_match, if_range
+    )
+    _audit_access(current_user, "file.download", file_id, resp)
+    return resp
+
+
 # ============================================================
 # 📌 VIEW (DECRYPTED) — preview inline in browser
 # ============================================================
 @router.get("/{file_id}/view-decrypted")
-def view_decrypted_file(file_id: int, current_user = Depends(get_current_user)):
+async def view_decrypted_file(
+    file_id: int,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_range: Optional[str] = Header(None, alias="If-Range"),
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
     """
     Decrypt the stored file server-side and stream plaintext back inline.
     Use this for previewing (browser will render PDFs/images inline).
     Requires normal Bearer auth (get_current_user).
+    Supports single `Range` requests so PDF.js / <video> can seek without a full decrypt,
+    and ETag revalidation (304) so the browser can reuse its cached copy.
     """
-    rec = crud.get_file_record(file_id)
+    rec = await crud.get_file_record(session, file_id)
     if not rec:
         raise HTTPException(status_code=404, detail="File not found")
 
-    # 1) Download encrypted bytes from B2
-    try:
-        encrypted = b2_client.download_bytes(settings.B2_BUCKET, rec.file_key)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed reading storage: {e}")
-
-    # 2) Unwrap DEK + decrypt
-    try:
-        dek = crypto.unwrap_dek(rec.wrapped_dek)
-        plaintext = crypto.decrypt_aes_gcm(encrypted, dek)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Decryption failed: {e}")
-
-    # 3) Determine media type from filename (fallback to octet-stream)
+    # Determine media type from filename (fallback to octet-stream)
     guessed, _ = mimetypes.guess_type(rec.filename)
     media_type = guessed or "application/octet-stream"
 
-    # 4) Stream plaintext back (inline so browser can preview)
-    return StreamingResponse(
-        BytesIO(plaintext),
-        media_type=media_type,
-        headers={"Content-Disposition": f'inline; filename="{rec.filename}"'}
-    )
+    resp = await _decrypted_response(rec, media_type, "inline", range_header, if_none_match, if_range)
+    _audit_access(current_user, "file.view", file_id, resp)
+    return resp
 
 
 # ============================================================
 # 📌 LIST FILES FOR A PATIENT
 # ============================================================
-@router.get("/patient/{patient_id}", response_model=List[schemas.FileRecordRead])
-def list_patient_files(patient_id: int, current_user = Depends(get_current_user)):
-    if not crud.patient_exists(patient_id):
+@router.get("/patient/{patient_id}", response_model=schemas.FileRecordPage)
+async def list_patient_files(
+    patient_id: int,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    size, after = page_size(limit), cursor_key(cursor)
+
+    async def load():
+        if not await crud.patient_exists(session, patient_id):
+            return None
+        items, key = await crud.list_files_for_patient(session, patient_id, limit=size, after=after)
+        return {
+            "items": [schemas.FileRecordRead.model_validate(r, from_attributes=True).model_dump(mode="json") for r in items],
+            "next_cursor": next_cursor(key),
+        }
+
+    page = await cache.read_through(cache.patient_files_ns(patient_id), f"{size}:{cursor or ''}", load)
+    if page is None:
         raise HTTPException(status_code=404, detail="Patient not found")
 
-    return crud.list_files_for_patient(patient_id)
+    headers = {"ETag": json_etag(page), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return page
 
 
 # ============================================================
 # 📌 DELETE FILE
 # ============================================================
 @router.delete("/{file_id}", status_code=200)
-def delete_file(file_id: int, current_user = Depends(get_current_user)):
-    rec = crud.get_file_record(file_id)
+async def delete_file(
+    file_id: int,
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    rec = await crud.get_file_record(session, file_id)
     if not rec:
         raise HTTPException(status_code=404, detail="File not found")
 
-    # 1) Delete encrypted file from B2
+    # 1) Delete encrypted file from storage
     try:
-        s3 = b2_client.get_s3_client()
-        s3.delete_object(Bucket=settings.B2_BUCKET, Key=rec.file_key)
+        await get_storage().delete(rec.file_key)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed deleting from storage: {e}")
 
     # 2) Delete metadata from DB
-    success = crud.delete_file_record(file_id)
+    success = await crud.delete_file_record(session, file_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed deleting file metadata")
 
+    # 3) Forget the cached DEK
+    dek_cache.invalidate(file_id)
+
+    log_action(current_user, "file.delete", "file", file_id, summary=rec.filename)
     return {"ok": True, "message": "File deleted"}
 
 
@@ -179,14 +659,18 @@ def delete_file(file_id: int, current_user = Depends(get_current_user)):
 # 📌 OPTIONAL: PRESIGNED DOWNLOAD URL
 # ============================================================
 @router.get("/{file_id}/presigned")
-def get_presigned_url(file_id: int, current_user = Depends(get_current_user)):
-    rec = crud.get_file_record(file_id)
+async def get_presigned_url(
+    file_id: int,
+    current_user = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    rec = await crud.get_file_record(session, file_id)
     if not rec:
         raise HTTPException(status_code=404, detail="File not found")
 
-    url = b2_client.generate_presigned_get(
-        settings.B2_BUCKET,
-        rec.file_key,
-        expires_in=3600
-    )
+    try:
+        url = await get_storage().presign_get(rec.file_key, expires_in=3600)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    log_action(current_user, "file.presign", "file", file_id)
     return {"url": url}
@@ -0,0 +1,30 @@
+# app/routes/metrics.py
+from fastapi import APIRouter, Depends
+
+from app.auth import require_admin
+from app.services import cache
+from app.services.audit_writer import audit_writer
+from app.services.auth_cache import token_versions, user_cache
+from app.services.dek_cache import dek_cache
+from app.services.passwords import pool_stats
+from app.services.rate_limit import login_ip_limiter, login_account_limiter
+from app.services.schedule import schedule_index
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/")
+def get_metrics(current_user=Depends(require_admin)):
+    """
+    In-process runtime metrics for this worker (admin only).
+    """
+    return {
+        "dek_cache": dek_cache.stats(),
+        "read_cache": cache.stats(),
+        "audit_writer": audit_writer.stats(),
+        "auth_token_versions": token_versions.stats(),
+        "auth_user_cache": user_cache.stats(),
+        "password_pool": pool_stats(),
+        "schedule_index": schedule_index.stats(),
+        "login_rate_limit": {"ip": login_ip_limiter.stats(), "account": login_account_limiter.stats()},
+    }
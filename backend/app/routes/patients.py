@@ -1,40 +1,195 @@
 # app/routes/patients.py
-from fastapi import APIRouter, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Response, UploadFile, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
 
 from app import crud, schemas
+from app.auth import get_current_user, require_admin
+from app.db import get_async_session
+from app.routes.audit import log_action
+from app.config import settings
+from app.services import cache, patient_io
+from app.services.search import search_terms
+from app.utils import page_size, cursor_key, next_cursor, make_etag, etag_matches
 
 router = APIRouter(prefix="/patients", tags=["patients"])
 
+SUMMARY_FIELDS = ("id", "name", "age", "condition")
+
 
 @router.post("/", response_model=schemas.PatientRead)
-def create_patient(payload: schemas.PatientCreate):
-    return crud.create_patient(**payload.dict())
+async def create_patient(payload: schemas.PatientCreate, session: AsyncSession = Depends(get_async_session)):
+    p = await crud.create_patient(session, **payload.dict())
+    return p
+
+
+
+@router.get("/", response_model=schemas.PatientPage)
+async def list_patients(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    List patients, oldest first. Pass the returned `next_cursor` back as
+    `cursor` to fetch the next page; it is null on the last page.
+    """
+    items, key = await crud.list_patients(session, limit=page_size(limit), after=cursor_key(cursor))
+    return {"items": items, "next_cursor": next_cursor(key)}
 
 
+@router.post("/import", response_model=schemas.PatientImportReport)
+async def import_patients(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user=Depends(require_admin),
+):
+    """
+    Bulk-create patients from a CSV (header row of PatientCreate fields) or
+    NDJSON upload. `format` defaults to the file extension. Valid rows are
+    inserted in batches; invalid ones are listed in the report by line number.
+    Admins only.
+    """
+    fmt = format or patient_io.format_for(file.filename)
+    if fmt not in patient_io.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    report = await patient_io.import_patients(file.file, fmt)
+    log_action(current_user, "patient.import", summary=f"{report['inserted']} inserted, {report['failed']} failed")
+    return report
+
+
+@router.get("/export")
+async def export_patients(format: str = "ndjson", current_user=Depends(require_admin)):
+    """
+    Stream every patient as NDJSON (default) or CSV. Admins only.
+    """
+    if format not in patient_io.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    log_action(current_user, "patient.export", summary=format)
+    return StreamingResponse(
+        patient_io.export_patients(format),
+        media_type=patient_io.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="patients.{format}"'},
+    )
+
 
-@router.get("/", response_model=List[schemas.PatientRead])
-def list_patients():
+@router.get("/summary", responses={200: {"model": schemas.PatientSummaryPage}})
+async def list_patient_summaries(
+    fields: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
     """
-    List patients (simple pagination not implemented).
+    Lightweight patient listing for list views. `fields` is a comma-separated
+    subset of patient columns (default: id,name,age,condition); only those are
+    read from the database and returned. Paged like GET /patients/.
     """
-    return crud.list_patients(limit=200, offset=0)
+    names = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(SUMMARY_FIELDS)
+    unknown = sorted(set(names) - set(crud.PATIENT_FIELDS))
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields")
+    items, key = await crud.list_patient_fields(
+        session, list(dict.fromkeys(names)), limit=page_size(limit), after=cursor_key(cursor)
+    )
+    stamps = [f for f in ("created_at", "updated_at") if f in names]
+    for item in items:
+        for f in stamps:
+            item[f] = item[f] and item[f].isoformat()
+    # rows are plain dicts of JSON types, so skip response-model validation
+    return JSONResponse({"items": items, "next_cursor": next_cursor(key)})
+
+
+@router.get("/search", response_model=schemas.PatientPage)
+async def search_patients(
+    q: str,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Ranked, prefix-matching search over name, condition, allergies, medications
+    and medical history ("ali asth" finds "Alice ... Asthma"). Pages are
+    offset-based; pass `next_cursor` back as `cursor`.
+    """
+    size = page_size(limit)
+    (offset,) = cursor_key(cursor, arity=1) or (0,)
+    if not isinstance(offset, int) or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    items = await crud.search_patients(session, search_terms(q), limit=size + 1, offset=offset)
+    more = len(items) > size and offset + size < settings.SEARCH_MAX_OFFSET
+    return {"items": items[:size], "next_cursor": next_cursor((offset + size,) if more else None)}
 
 
 @router.get("/{patient_id}", response_model=schemas.PatientRead)
-def get_patient(patient_id: int):
+async def get_patient(
+    patient_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    session: AsyncSession = Depends(get_async_session),
+):
     """
-    Get patient details by id.
+    Get patient details by id. Carries an ETag that changes on every update;
+    a matching If-None-Match gets 304 Not Modified with no body.
     """
-    p = crud.get_patient(patient_id)
+    async def load():
+        p = await crud.get_patient(session, patient_id)
+        return schemas.PatientRead.model_validate(p, from_attributes=True).model_dump(mode="json") if p else None
+
+    p = await cache.read_through(cache.patient_ns(patient_id), "detail", load)
     if not p:
         raise HTTPException(status_code=404, detail="Patient not found")
+
+    headers = {
+        "ETag": make_etag("patient", p["id"], p["updated_at"] or p["created_at"]),
+        "Cache-Control": "private, no-cache",
+    }
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return p
 
 
+@router.get("/{patient_id}/chart", response_model=schemas.PatientChart)
+async def get_patient_chart(
+    patient_id: int,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Everything the patient page shows, in one call and a fixed number of
+    queries: the record, its files, upcoming appointments and (for admins)
+    recent audit activity on the patient.
+    """
+    p = await crud.get_patient_chart(session, patient_id)
+    if not p:
+        raise HTTPException(status_code=404, detail="Patient not found")
+
+    activity = None
+    if current_user.role == "admin":
+        activity, _ = await crud.list_audit_logs(
+            session,
+            limit=settings.CHART_AUDIT_LIMIT,
+            target_type="patient",
+            target_id=str(patient_id),
+            descending=True,
+        )
+    return {
+        "patient": p,
+        "files": sorted(p.files, key=lambda f: (f.uploaded_at, f.id), reverse=True),
+        "upcoming_appointments": sorted(p.appointments, key=lambda a: (a.start_at, a.id))[
+            : settings.CHART_APPOINTMENTS_LIMIT
+        ],
+        "recent_activity": activity,
+    }
+
+
 @router.put("/{patient_id}", response_model=schemas.PatientRead)
-def update_patient(patient_id: int, payload: schemas.PatientCreate):
-    updated = crud.update_patient(patient_id, payload.dict())
+async def update_patient(
+    patient_id: int, payload: schemas.PatientCreate, session: AsyncSession = Depends(get_async_session)
+):
+    updated = await crud.update_patient(session, patient_id, payload.dict())
     if not updated:
         raise HTTPException(404, "Patient not found")
     return updated
@@ -42,11 +197,11 @@ def update_patient(patient_id: int, payload: schemas.PatientCreate):
 
 
 @router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_patient(patient_id: int):
+async def delete_patient(patient_id: int, session: AsyncSession = Depends(get_async_session)):
     """
     Delete a patient record.
     """
-    ok = crud.delete_patient(patient_id)
+    ok = await crud.delete_patient(session, patient_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Patient not found")
     return {}
@@ -0,0 +1,49 @@
+# app/routes/stats.py
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
+from datetime import datetime, timedelta
+
+from app import schemas
+from app.auth import get_current_user
+from app.config import settings
+from app.db import get_async_session
+from app.services import stats
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+def _counts(rows):
+    return [{"key": r.key, "count": r.value} for r in rows]
+
+
+@router.get("/", response_model=schemas.DashboardStats)
+async def get_stats(
+    days: Optional[int] = None,
+    top: Optional[int] = None,
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Dashboard aggregates, read from pre-computed counters (a handful of indexed
+    lookups, independent of table sizes). `days` sets the uploads-per-day window
+    and `top` the length of the per-condition and per-patient lists.
+    """
+    days = days or settings.STATS_DAYS_DEFAULT
+    top = top or settings.STATS_TOP_N
+    if not (0 < days <= 366 and 0 < top <= 100):
+        raise HTTPException(status_code=400, detail="days must be 1-366 and top 1-100")
+
+    now = datetime.utcnow()
+    first_day = stats.day_key(now - timedelta(days=days - 1))
+    active_since = stats.epoch(now - timedelta(days=settings.STATS_ACTIVE_DOCTOR_DAYS))
+    return {
+        "patients_total": await stats.get_value(session, stats.PATIENTS_TOTAL),
+        "files_total": await stats.get_value(session, stats.FILES_TOTAL),
+        "active_doctors": await stats.count_at_least(session, stats.DOCTOR_LAST_SEEN, active_since),
+        "patients_by_condition": _counts(await stats.top(session, stats.PATIENTS_BY_CONDITION, top)),
+        "uploads_by_day": _counts(
+            await stats.key_range(session, stats.UPLOADS_BY_DAY, first_day, stats.day_key(now))
+        ),
+        "files_per_patient": _counts(await stats.top(session, stats.FILES_BY_PATIENT, top)),
+    }
@@ -51,11 +51,44 @@ class PatientRead(BaseModel):
     allergies: Optional[str]
     current_medications: Optional[str]
     created_at: datetime
+    updated_at: Optional[datetime] = None
 
     class Config:
         orm_mode = True
 
 
+class PatientPage(BaseModel):
+    items: List[PatientRead]
+    next_cursor: Optional[str] = None
+
+
+class PatientSummary(BaseModel):
+    """
+    Row shape of GET /patients/summary. Only the requested `fields` are present;
+    the default set is id, name, age and condition.
+    """
+    id: Optional[int] = None
+    name: Optional[str] = None
+    age: Optional[int] = None
+    condition: Optional[str] = None
+
+
+class PatientSummaryPage(BaseModel):
+    items: List[PatientSummary]
+    next_cursor: Optional[str] = None
+
+
+class PatientImportError(BaseModel):
+    line: Optional[int] = None
+    errors: List[str]
+
+
+class PatientImportReport(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[PatientImportError]
+    errors_truncated: bool = False
+
 
 # -------------------------
 # FileRecord metadata
@@ -77,6 +110,107 @@ class FileRecordRead(BaseModel):
         orm_mode = True
 
 
+class FileRecordPage(BaseModel):
+    items: List[FileRecordRead]
+    next_cursor: Optional[str] = None
+
+
+class BatchUploadItem(BaseModel):
+    filename: Optional[str]
+    patient_id: int
+    ok: bool
+    file: Optional[FileRecordRead] = None
+    error: Optional[str] = None
+
+
+class BatchUploadResult(BaseModel):
+    uploaded: int
+    failed: int
+    results: List[BatchUploadItem]
+
+
+# -------------------------
+# Direct-to-storage (presigned) uploads
+# -------------------------
+class DirectUploadInit(BaseModel):
+    patient_id: int
+    filename: str
+    size: int  # plaintext bytes
+    content_type: Optional[str] = None
+
+
+class DirectUploadPart(BaseModel):
+    part_number: int
+    url: str
+
+
+class DirectUploadTicket(BaseModel):
+    upload_token: str
+    file_key: str
+    dek: str  # base64 raw AES-256 key for WebCrypto
+    header: str  # base64 stream header the client must write first and use as AAD
+    chunk_size: int
+    part_size: int
+    ciphertext_size: int
+    expires_in: int
+    parts: List[DirectUploadPart]
+
+
+class CompletedPart(BaseModel):
+    part_number: int
+    etag: str
+
+
+class DirectUploadComplete(BaseModel):
+    upload_token: str
+    parts: List[CompletedPart]
+
+
+class DirectUploadAbort(BaseModel):
+    upload_token: str
+
+
+# -------------------------
+# Appointments
+# -------------------------
+class AppointmentCreate(BaseModel):
+    patient_id: int
+    doctor_id: str
+    start_at: datetime
+    end_at: Optional[datetime] = None  # default: start_at + APPOINTMENT_DEFAULT_MINUTES
+    notes: Optional[str] = None
+
+
+class AppointmentReschedule(BaseModel):
+    start_at: datetime
+    end_at: Optional[datetime] = None  # default: keep the current length
+
+
+class AppointmentRead(BaseModel):
+    id: int
+    patient_id: int
+    doctor_id: Optional[str]
+    start_at: datetime
+    end_at: Optional[datetime]
+    notes: Optional[str]
+    status: str
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+
+class TimeSlot(BaseModel):
+    start_at: datetime
+    end_at: datetime
+
+
+class FirstAvailableSlot(BaseModel):
+    doctor_id: str
+    start_at: datetime
+    end_at: datetime
+
+
 # -------------------------
 # Audit log
 # -------------------------
@@ -92,3 +226,35 @@ class AuditLogRead(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class AuditLogPage(BaseModel):
+    items: List[AuditLogRead]
+    next_cursor: Optional[str] = None
+
+
+# -------------------------
+# Patient chart (one call per patient page)
+# -------------------------
+class PatientChart(BaseModel):
+    patient: PatientRead
+    files: List[FileRecordRead]  # newest first
+    upcoming_appointments: List[AppointmentRead]  # soonest first
+    recent_activity: Optional[List[AuditLogRead]] = None  # admins only, newest first
+
+
+# -------------------------
+# Dashboard statistics
+# -------------------------
+class StatCount(BaseModel):
+    key: str
+    count: int
+
+
+class DashboardStats(BaseModel):
+    patients_total: int
+    files_total: int
+    active_doctors: int
+    patients_by_condition: List[StatCount]  # most common first; "" = no condition
+    uploads_by_day: List[StatCount]  # YYYY-MM-DD (UTC), oldest first, days without uploads omitted
+    files_per_patient: List[StatCount]  # patient id, most files first
@@ -0,0 +1,475 @@
+# app/services/audit_archive.py
+"""
+Time-partitioned audit storage with archival to encrypted Parquet.
+
+Live audit events are kept for AUDIT_HOT_MONTHS calendar months:
+  - Postgres: `auditlog` is range-partitioned by month (see the migration);
+    ensure_partitions() creates upcoming monthly partitions ahead of time.
+  - SQLite has no partitioning, so the live table is a rolling window: closed
+    months are range-deleted from it once archived.
+
+compact() moves every closed month older than the hot window into Parquet
+objects (zstd by default) of at most AUDIT_ARCHIVE_MAX_ROWS rows, encrypted like
+uploads (stream format, per-object DEK wrapped by the master key). Rows are
+streamed from the database and each row group is encrypted and uploaded through
+the storage backend as it is produced, so memory stays flat however big the
+month. An AuditArchive row records each object. On Postgres the month's partition is
+then detached and dropped, which is cheaper than a DELETE.
+
+list_audit_logs()/get_audit_log() span live rows and archives: archives are
+only opened for months that overlap the query and could still contribute to the
+requested page; get_audit_log() fetches only the objects whose id range covers
+the id. Decoded objects are kept in a small LRU.
+
+pyarrow is optional: it is only imported by compaction and archive reads.
+"""
+import datetime
+import io
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, text
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from . import crypto
+from .storage import get_storage
+from .. import crud
+from ..config import settings
+from ..db import async_engine
+from ..models import AuditArchive, AuditLog
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+_FIELDS = ("id", "actor_id", "actor_role", "action", "target_type", "target_id", "timestamp", "summary")
+_FILTERS = ("actor_id", "action", "target_type", "target_id")
+
+
+class ArchiveUnavailable(RuntimeError):
+    """Archived audit data was needed but cannot be read (e.g. pyarrow missing)."""
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ArchiveUnavailable("pyarrow is required for audit archives (pip install pyarrow)")
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("actor_id", pa.string()),
+        ("actor_role", pa.string()),
+        ("action", pa.string()),
+        ("target_type", pa.string()),
+        ("target_id", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("summary", pa.string()),
+    ])
+
+
+# -------------------------
+# MONTHS / PARTITIONS
+# -------------------------
+def month_start(dt: datetime.datetime) -> datetime.datetime:
+    return dt.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(dt: datetime.datetime, n: int) -> datetime.datetime:
+    years, month = divmod(dt.month - 1 + n, 12)
+    return dt.replace(year=dt.year + years, month=month + 1)
+
+
+def partition_name(start: datetime.datetime) -> str:
+    return f"auditlog_y{start.year:04d}m{start.month:02d}"
+
+
+def hot_cutoff(hot_months: Optional[int] = None) -> datetime.datetime:
+    """
+    Start of the oldest month still kept live; everything before it is archivable.
+    """
+    months = settings.AUDIT_HOT_MONTHS if hot_months is None else hot_months
+    return add_months(month_start(datetime.datetime.utcnow()), -max(1, months) + 1)
+
+
+async def ensure_partitions(months_ahead: Optional[int] = None) -> None:
+    """
+    Postgres only: create monthly partitions for the current and upcoming months,
+    so inserts never land in the default partition. No-op elsewhere.
+    """
+    if async_engine.dialect.name != "postgresql":
+        return
+    ahead = settings.AUDIT_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    async with async_engine.connect() as conn:
+        partitioned = await conn.scalar(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+            "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'auditlog')"
+        ))
+    if not partitioned:
+        logger.warning("auditlog is not partitioned; run the Alembic migrations")
+        return
+
+    first = month_start(datetime.datetime.utcnow())
+    for i in range(ahead + 1):
+        start = add_months(first, i)
+        end = add_months(start, 1)
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF auditlog "
+                    f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+                ))
+        except Exception:
+            # usually rows for this month already sit in the default partition
+            logger.exception("Could not create audit partition %s", partition_name(start))
+
+
+# -------------------------
+# COMPACTION
+# -------------------------
+class _EncryptingSink:
+    """
+    Write-only file object for pq.ParquetWriter: encrypts what it is given into
+    the stream format and holds the ciphertext until drain() hands it on.
+    """
+
+    def __init__(self, dek: bytes):
+        self._enc = crypto.StreamEncryptor(dek)
+        self._out = bytearray(self._enc.header)
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._pos += len(data)
+        self._out += self._enc.update(bytes(data))
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self, final: bool = False) -> bytes:
+        if final:
+            self._out += self._enc.finalize()
+        data = bytes(self._out)
+        self._out.clear()
+        return data
+
+
+class _ArchiveWriter:
+    """
+    One archive object being written. Each batch becomes a Parquet row group that
+    is encrypted and streamed to storage straight away, so memory holds about
+    one row group (AUDIT_ARCHIVE_FETCH_SIZE rows) whatever the month's size.
+    """
+
+    def __init__(self, start: datetime.datetime):
+        dek = crypto.generate_dek()
+        self.key = f"audit-archive/{start:%Y-%m}/{uuid.uuid4()}.parquet.enc"
+        self.wrapped_dek = crypto.wrap_dek(dek)
+        self.key_version = crypto.current_key_version()
+        self.rows = 0
+        self.size_bytes = 0
+        self.min_id: Optional[int] = None
+        self.max_id: Optional[int] = None
+        self._sink = _EncryptingSink(dek)
+        self._parquet = pq.ParquetWriter(self._sink, _schema(), compression=settings.AUDIT_ARCHIVE_COMPRESSION)
+        self._out = get_storage().open_writer(self.key, content_type="application/octet-stream")
+
+    async def _push(self, data: bytes) -> None:
+        if data:
+            await self._out.write(data)
+            self.size_bytes += len(data)
+
+    async def write(self, batch) -> None:
+        await run_in_threadpool(self._parquet.write_batch, batch)
+        lo, hi = pc.min(batch.column(0)).as_py(), pc.max(batch.column(0)).as_py()
+        self.min_id = lo if self.min_id is None else min(self.min_id, lo)
+        self.max_id = hi if self.max_id is None else max(self.max_id, hi)
+        self.rows += batch.num_rows
+        await self._push(self._sink.drain())
+
+    async def close(self) -> None:
+        await run_in_threadpool(self._parquet.close)
+        await self._push(self._sink.drain(final=True))
+        await self._out.close()
+
+    async def abort(self) -> None:
+        await self._out.abort()
+
+
+async def _drop_partition_if_empty(conn, start: datetime.datetime) -> None:
+    name = partition_name(start)
+    if not await conn.scalar(text(f"SELECT to_regclass('{name}') IS NOT NULL")):
+        return
+    if await conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {name})")):
+        return
+    await conn.execute(text(f"ALTER TABLE auditlog DETACH PARTITION {name}"))
+    await conn.execute(text(f"DROP TABLE {name}"))
+
+
+async def _compact_period(start: datetime.datetime, end: datetime.datetime, dry_run: bool) -> Dict[str, Any]:
+    in_period = (AuditLog.timestamp >= start, AuditLog.timestamp < end)
+    if dry_run:
+        async with async_engine.connect() as conn:
+            rows = await conn.scalar(select(func.count()).select_from(AuditLog).where(*in_period))
+        return {"period": f"{start:%Y-%m}", "rows": rows}
+
+    columns = [getattr(AuditLog, f) for f in _FIELDS]
+    statement = select(*columns).where(*in_period).order_by(AuditLog.timestamp, AuditLog.id)
+    max_rows = max(1, settings.AUDIT_ARCHIVE_MAX_ROWS)
+    done: List[_ArchiveWriter] = []
+    current: Optional[_ArchiveWriter] = None
+    try:
+        async with async_engine.connect() as conn:
+            result = await conn.stream(statement)
+            async for part in result.partitions(settings.AUDIT_ARCHIVE_FETCH_SIZE):
+                batch = pa.RecordBatch.from_pylist([dict(r._mapping) for r in part], _schema())
+                # split across objects so none exceeds AUDIT_ARCHIVE_MAX_ROWS
+                while batch.num_rows:
+                    if current is None:
+                        current = _ArchiveWriter(start)
+                    room = max_rows - current.rows
+                    await current.write(batch.slice(0, room))
+                    batch = batch.slice(room)
+                    if current.rows >= max_rows:
+                        await current.close()
+                        done.append(current)
+                        current = None
+        if current is not None:
+            await current.close()
+            done.append(current)
+            current = None
+
+        rows = sum(w.rows for w in done)
+        async with async_engine.begin() as conn:
+            if done:
+                await conn.execute(insert(AuditArchive).values([
+                    {
+                        "period_start": start,
+                        "period_end": end,
+                        "object_key": w.key,
+                        "row_count": w.rows,
+                        "min_id": w.min_id,
+                        "max_id": w.max_id,
+                        "size_bytes": w.size_bytes,
+                        "wrapped_dek": w.wrapped_dek,
+                        "key_version": w.key_version,
+                        "created_at": datetime.datetime.utcnow(),
+                    }
+                    for w in done
+                ]))
+                # only remove what was archived; late events (higher ids) wait for the next run
+                max_id = max(w.max_id for w in done)
+                deleted = await conn.execute(delete(AuditLog).where(*in_period, AuditLog.id <= max_id))
+                if deleted.rowcount != rows:
+                    raise RuntimeError(
+                        f"{start:%Y-%m}: archived {rows} rows but {deleted.rowcount} matched for deletion"
+                    )
+            if async_engine.dialect.name == "postgresql":
+                await _drop_partition_if_empty(conn, start)
+    except Exception:
+        if current is not None:
+            await current.abort()
+        storage = get_storage()
+        for w in done:
+            try:
+                await storage.delete(w.key)
+            except Exception:
+                logger.warning("Failed to clean up audit archive object %s", w.key)
+        raise
+
+    summary = {"period": f"{start:%Y-%m}", "rows": rows}
+    if done:
+        summary.update(objects=len(done), size_bytes=sum(w.size_bytes for w in done))
+    return summary
+
+
+async def compact(hot_months: Optional[int] = None, dry_run: bool = False) -> List[Dict[str, Any]]:
+    """
+    Archive every closed month older than the hot window. Safe to re-run.
+    """
+    _require_pyarrow()
+    await ensure_partitions()
+    cutoff = hot_cutoff(hot_months)
+    async with async_engine.connect() as conn:
+        oldest = await conn.scalar(select(func.min(AuditLog.timestamp)).where(AuditLog.timestamp < cutoff))
+
+    results = []
+    period = month_start(oldest) if oldest is not None else cutoff
+    while period < cutoff:
+        end = add_months(period, 1)
+        results.append(await _compact_period(period, end, dry_run))
+        period = end
+    _cache.clear()
+    return results
+
+
+# -------------------------
+# READING ARCHIVES
+# -------------------------
+class _ArchiveCache:
+    """
+    LRU of decoded archive objects: archive id -> pyarrow Table. Archives are
+    write-once, so entries never go stale.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, Any]" = OrderedDict()
+
+    def get(self, archive_id: int):
+        table = self._entries.get(archive_id)
+        if table is not None:
+            self._entries.move_to_end(archive_id)
+        return table
+
+    def put(self, archive_id: int, table) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[archive_id] = table
+        self._entries.move_to_end(archive_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_cache = _ArchiveCache(settings.AUDIT_ARCHIVE_CACHE_ENTRIES)
+
+
+def _decode(data: bytes, dek: bytes):
+    return pq.read_table(io.BytesIO(crypto.decrypt_file_bytes(data, dek)))
+
+
+async def _load_archive(archive: AuditArchive):
+    """
+    One archive object as a Table (at most AUDIT_ARCHIVE_MAX_ROWS rows).
+    """
+    _require_pyarrow()
+    table = _cache.get(archive.id)
+    if table is None:
+        data = await get_storage().read_bytes(archive.object_key)
+        table = await run_in_threadpool(_decode, data, crypto.unwrap_dek(archive.wrapped_dek))
+        _cache.put(archive.id, table)
+    return table
+
+
+async def _load_period(archives: List[AuditArchive]):
+    """
+    All archives of one month as a single Table.
+    """
+    tables = [await _load_archive(a) for a in archives]
+    return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+
+def _select(table, filters: Dict[str, Any], after: Optional[Tuple], descending: bool, limit: int) -> List[AuditLog]:
+    mask = None
+
+    def add(cond):
+        nonlocal mask
+        mask = cond if mask is None else pc.and_kleene(mask, cond)
+
+    for name in _FILTERS:
+        if filters.get(name) is not None:
+            add(pc.equal(table[name], filters[name]))
+    ts_type = pa.timestamp("us")
+    if filters.get("since") is not None:
+        add(pc.greater_equal(table["timestamp"], pa.scalar(filters["since"], ts_type)))
+    if filters.get("until") is not None:
+        add(pc.less(table["timestamp"], pa.scalar(filters["until"], ts_type)))
+    if after is not None:
+        a_ts, a_id = pa.scalar(after[0], ts_type), pa.scalar(after[1], pa.int64())
+        beyond, past_id = (pc.less, pc.less) if descending else (pc.greater, pc.greater)
+        add(pc.or_kleene(
+            beyond(table["timestamp"], a_ts),
+            pc.and_kleene(pc.equal(table["timestamp"], a_ts), past_id(table["id"], a_id)),
+        ))
+    if mask is not None:
+        table = table.filter(mask)
+    order = "descending" if descending else "ascending"
+    table = table.sort_by([("timestamp", order), ("id", order)]).slice(0, limit)
+    return [AuditLog(**row) for row in table.to_pylist()]
+
+
+def _periods(archives: List[AuditArchive]) -> "OrderedDict[datetime.datetime, List[AuditArchive]]":
+    grouped: "OrderedDict[datetime.datetime, List[AuditArchive]]" = OrderedDict()
+    for a in sorted(archives, key=lambda a: (a.period_start, a.id)):
+        grouped.setdefault(a.period_start, []).append(a)
+    return grouped
+
+
+def _key(row: AuditLog) -> Tuple:
+    return (row.timestamp, row.id)
+
+
+async def list_audit_logs(
+    session: AsyncSession,
+    limit: int = 100,
+    after: Optional[Tuple] = None,
+    descending: bool = False,
+    **filters,
+) -> Tuple[List[AuditLog], Optional[Tuple]]:
+    """
+    crud.list_audit_logs over live rows and archives together, same keyset order.
+    """
+    want = limit + 1
+    live, _ = await crud.list_audit_logs(session, limit=want, after=after, descending=descending, **filters)
+
+    archives = (await session.exec(select(AuditArchive))).all()
+    archived: List[AuditLog] = []
+    if archives:
+        # archive rows past the live page's last key cannot make this page
+        bound = _key(live[-1])[0] if len(live) == want else None
+        since, until = filters.get("since"), filters.get("until")
+        periods = list(_periods(archives).items())
+        if descending:
+            periods.reverse()
+        for start, group in periods:
+            end = group[0].period_end
+            if len(archived) >= want:
+                break
+            if (since is not None and end <= since) or (until is not None and start >= until):
+                continue
+            if after is not None and (start > after[0] if descending else end <= after[0]):
+                continue
+            if bound is not None and (end <= bound if descending else start > bound):
+                break
+            table = await _load_period(group)
+            archived.extend(_select(table, filters, after, descending, want - len(archived)))
+
+    rows = sorted(live + archived, key=_key, reverse=descending)[:want]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _key(rows[-1])
+
+
+async def get_audit_log(session: AsyncSession, log_id: int) -> Optional[AuditLog]:
+    log = await crud.get_audit_log(session, log_id)
+    if log is not None:
+        return log
+    statement = select(AuditArchive).where(AuditArchive.min_id <= log_id, AuditArchive.max_id >= log_id)
+    candidates = (await session.exec(statement)).all()
+    # only the objects whose id range covers log_id are fetched, not whole months
+    for archive in sorted(candidates, key=lambda a: a.id):
+        table = await _load_archive(archive)
+        found = table.filter(pc.equal(table["id"], log_id)).to_pylist()
+        if found:
+            return AuditLog(**found[0])
+    return None
@@ -0,0 +1,416 @@
+# app/services/audit_writer.py
+"""
+Asynchronous, batched audit log writer.
+
+Routes call `audit_writer.record(...)`, which appends the event to a local spool
+file and returns; no database work happens on the request path. A background
+task flushes pending events with multi-row INSERTs whenever AUDIT_BATCH_SIZE
+events are waiting or AUDIT_FLUSH_INTERVAL_SECONDS has passed, and once more on
+shutdown.
+
+Durability: an event is on disk (flushed to the OS, plus fsync with
+AUDIT_SPOOL_FSYNC) before record() returns. Each flush rotates the active spool
+segment to a closed `.jsonl` file and deletes it only after its rows are
+committed. Closed segments left behind by a crash or a failed flush are replayed
+on startup and on every later flush, so events are never dropped; a crash between
+commit and unlink can at worst insert a segment twice.
+
+A segment never blocks the ones behind it. Lines that cannot be decoded (e.g.
+torn by a crash mid-write) are skipped and appended to a `.bad` file next to the
+segment. A segment the database keeps rejecting while it is otherwise reachable
+is renamed to `.bad` after AUDIT_SEGMENT_MAX_ATTEMPTS tries; a database outage
+never counts against a segment. `.bad` files are kept for inspection only.
+
+Workers may share AUDIT_SPOOL_DIR: each process spools to its own `<pid>`
+subdirectory and holds an exclusive lock on the `lock` file inside it for its
+lifetime. On startup a process adopts the segments of any subdirectory whose lock
+it can take (its owner is gone) by renaming them into its own, so each segment
+is replayed by exactly one process.
+
+At most AUDIT_QUEUE_MAX events are also kept in memory, so a flush normally skips
+re-reading its segment; past that bound events are spooled only and read back
+from disk, keeping memory flat during a database outage.
+"""
+import asyncio
+import datetime
+import fcntl
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, text
+
+from ..config import settings
+from ..db import async_engine
+from ..models import AuditLog
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("actor_id", "actor_role", "action", "target_type", "target_id", "summary", "timestamp")
+
+
+def _decode_row(line: str) -> Dict[str, Any]:
+    row = json.loads(line)
+    row["timestamp"] = datetime.datetime.fromisoformat(row["timestamp"])
+    return row
+
+
+_LOCK_NAME = "lock"
+
+
+def _bad_path(path: str) -> str:
+    return path[: -len(".jsonl")] + ".bad"
+
+
+class AuditWriter:
+    def __init__(
+        self,
+        spool_dir: str,
+        batch_size: int,
+        flush_interval: float,
+        max_queue: int,
+        fsync: bool = False,
+        max_attempts: int = 5,
+    ):
+        self.spool_dir = spool_dir
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.fsync = fsync
+        self.max_attempts = max(1, max_attempts)
+
+        self._lock = threading.Lock()
+        self._dir: Optional[str] = None
+        self._lock_fd: Optional[int] = None
+        self._file = None
+        self._path: Optional[str] = None
+        self._seq = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_complete = True
+        self._depth = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._attempts: Dict[str, int] = {}
+
+        self.recorded = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.quarantined = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_ms_total = 0.0
+
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # the spool directory, open segment and buffered events belong to the parent
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # closing our copy leaves the parent's lock held
+        if self._file is not None:
+            self._file.close()
+        self._lock = threading.Lock()
+        self._dir, self._lock_fd, self._file, self._path = None, None, None, None
+        self._buffer, self._buffer_complete, self._depth = [], True, 0
+        self._loop = self._wake = self._task = self._flush_lock = None
+
+    # ---------------- recording (request path) ----------------
+    def record(
+        self,
+        action: str,
+        actor_id: Optional[str] = None,
+        actor_role: Optional[str] = None,
+        target_type: Optional[str] = None,
+        target_id: Optional[Any] = None,
+        summary: Optional[str] = None,
+    ) -> None:
+        """
+        Durably queue one audit event. Safe to call from any thread.
+        """
+        row = {
+            "actor_id": actor_id,
+            "actor_role": actor_role,
+            "action": action,
+            "target_type": target_type,
+            "target_id": str(target_id) if target_id is not None else None,
+            "summary": summary,
+            "timestamp": datetime.datetime.utcnow(),
+        }
+        line = json.dumps({**row, "timestamp": row["timestamp"].isoformat()}) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            if len(self._buffer) < self.max_queue:
+                self._buffer.append(row)
+            else:
+                self._buffer_complete = False
+            self._depth += 1
+            self.recorded += 1
+            full = self._depth >= self.batch_size
+
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def _own_dir(self) -> str:
+        """
+        This process's spool subdirectory, claimed on first use by locking it.
+        """
+        if self._dir is None:
+            path = os.path.join(self.spool_dir, str(os.getpid()))
+            os.makedirs(path, exist_ok=True)
+            fd = os.open(os.path.join(path, _LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o600)
+            # only ever contended briefly, by a process adopting a dead owner's segments
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._dir, self._lock_fd = path, fd
+        return self._dir
+
+    def _open_segment(self) -> None:
+        self._seq += 1
+        name = f"audit-{time.time_ns()}-{os.getpid()}-{self._seq:06d}.open"
+        self._path = os.path.join(self._own_dir(), name)
+        self._file = open(self._path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        """
+        Close the active segment; returns (closed_path, rows or None).
+        """
+        with self._lock:
+            if self._file is None:
+                return None, None
+            self._file.close()
+            closed = self._path[: -len(".open")] + ".jsonl"
+            os.replace(self._path, closed)
+            rows = self._buffer if self._buffer_complete else None
+            self._file, self._path = None, None
+            self._buffer, self._buffer_complete, self._depth = [], True, 0
+        return closed, rows
+
+    # ---------------- flushing (background) ----------------
+    def _closed_segments(self) -> List[str]:
+        if self._dir is None:
+            return []
+        names = sorted(n for n in os.listdir(self._dir) if n.endswith(".jsonl"))
+        return [os.path.join(self._dir, n) for n in names]
+
+    def _claim(self, path: str) -> None:
+        """
+        Move a segment into this process's directory; a segment that was still
+        open when its owner died is closed on the way.
+        """
+        name = os.path.basename(path)
+        if name.endswith(".open"):
+            name = name[: -len(".open")] + ".jsonl"
+        try:
+            os.replace(path, os.path.join(self._own_dir(), name))
+        except FileNotFoundError:
+            pass  # another process claimed it first
+
+    def _adopt(self, path: str) -> None:
+        """
+        Take over the segments in another process's directory if that process
+        is gone (its lock is free), then remove the directory.
+        """
+        try:
+            fd = os.open(os.path.join(path, _LOCK_NAME), os.O_RDWR)
+        except FileNotFoundError:
+            return  # not set up yet, or already adopted
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # owner is alive
+            try:
+                names = os.listdir(path)
+            except FileNotFoundError:
+                return
+            for name in names:
+                if name != _LOCK_NAME:
+                    self._claim(os.path.join(path, name))
+            try:
+                os.remove(os.path.join(path, _LOCK_NAME))
+                os.rmdir(path)
+            except OSError:
+                pass
+        finally:
+            os.close(fd)
+
+    def _recover(self) -> None:
+        """
+        Gather every segment this process should replay: its own unclosed ones,
+        those of dead processes, and any spooled in the top-level directory.
+        """
+        own = self._own_dir()
+        for name in os.listdir(own):
+            if name.endswith(".open"):
+                self._claim(os.path.join(own, name))
+        for name in os.listdir(self.spool_dir):
+            path = os.path.join(self.spool_dir, name)
+            if path == own:
+                continue
+            if os.path.isdir(path):
+                self._adopt(path)
+            elif name.endswith((".open", ".jsonl")):
+                self._claim(path)
+
+    def _read_segment(self, path: str) -> List[Dict[str, Any]]:
+        """
+        Decode a closed segment. Lines that do not parse are moved to the
+        segment's `.bad` file, and the segment is rewritten without them.
+        """
+        rows, good, bad = [], [], []
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rows.append(_decode_row(line))
+                    good.append(line)
+                except (ValueError, KeyError, TypeError):
+                    logger.error("Skipping undecodable audit line %d in %s", number, path)
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            with open(_bad_path(path), "a", encoding="utf-8") as f:
+                f.writelines(bad)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.writelines(good)
+            os.replace(path + ".tmp", path)
+            self.quarantined += len(bad)
+        return rows
+
+    async def _database_up(self) -> bool:
+        try:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        async with async_engine.begin() as conn:
+            for i in range(0, len(rows), self.batch_size):
+                chunk = [{c: r.get(c) for c in _COLUMNS} for r in rows[i:i + self.batch_size]]
+                await conn.execute(insert(AuditLog).values(chunk))
+            # dashboard "active doctors" counter, in the same transaction
+            activity = stats.upsert(conn.dialect.name, stats.doctor_activity(rows), keep_max=True)
+            if activity is not None:
+                await conn.execute(activity)
+
+    async def flush(self) -> None:
+        """
+        Write every pending event to the database, oldest segment first. If the
+        database is unavailable the segments stay on disk for the next flush;
+        one it keeps rejecting is quarantined so later events still get through.
+        """
+        async with self._flush_lock:
+            just_closed, rows = self._rotate()
+            for path in self._closed_segments():
+                started = time.perf_counter()
+                batch: List[Dict[str, Any]] = []
+                try:
+                    if path == just_closed and rows is not None:
+                        batch = rows
+                    else:
+                        batch = self._read_segment(path)
+                    if batch:
+                        await self._insert(batch)
+                    os.remove(path)
+                    self._attempts.pop(path, None)
+                except Exception:
+                    self.failures += 1
+                    if not await self._database_up():
+                        logger.exception("Audit flush failed; %s kept for retry", path)
+                        return
+                    attempts = self._attempts[path] = self._attempts.get(path, 0) + 1
+                    if attempts < self.max_attempts:
+                        logger.exception("Audit flush failed (attempt %d); %s kept for retry", attempts, path)
+                        return
+                    logger.exception("Audit segment %s rejected %d times; quarantined", path, attempts)
+                    with open(path, encoding="utf-8") as src, open(_bad_path(path), "a", encoding="utf-8") as dst:
+                        shutil.copyfileobj(src, dst)
+                    os.remove(path)
+                    self._attempts.pop(path, None)
+                    self.quarantined += len(batch)
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                self.flushes += 1
+                self.written += len(batch)
+                self.last_flush_ms = elapsed
+                self.max_flush_ms = max(self.max_flush_ms, elapsed)
+                self._flush_ms_total += elapsed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Audit writer loop error")
+
+    # ---------------- lifecycle ----------------
+    async def start(self) -> None:
+        """
+        Replay anything spooled by a previous run, then start the flush loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        # close anything this process recorded before start (e.g. while stopped)
+        self._rotate()
+        self._recover()
+        await self.flush()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_lock is not None:
+            await self.flush()
+        self._loop = None
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            depth = self._depth
+        return {
+            "queue_depth": depth,
+            "spooled_segments": len(self._closed_segments()),
+            "recorded": self.recorded,
+            "written": self.written,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "quarantined": self.quarantined,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self._flush_ms_total / self.flushes, 2) if self.flushes else 0.0,
+        }
+
+
+audit_writer = AuditWriter(
+    settings.AUDIT_SPOOL_DIR,
+    settings.AUDIT_BATCH_SIZE,
+    settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    settings.AUDIT_QUEUE_MAX,
+    settings.AUDIT_SPOOL_FSYNC,
+    settings.AUDIT_SEGMENT_MAX_ATTEMPTS,
+)
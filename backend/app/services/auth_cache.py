@@ -0,0 +1,89 @@
+# app/services/auth_cache.py
+"""
+In-process caches for the stateless auth path.
+
+Authorization trusts the signed `sub`/`role` claims, so a request no longer loads
+the User row. Two small TTL/LRU caches cover what is left:
+
+- token_versions: user id -> current User.token_version, checked against the
+  token's `tv` claim so bumping the version revokes every outstanding token.
+  The TTL bounds how long another worker may keep accepting a revoked token.
+- user_cache: user id -> User column values, for handlers that need the full row.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from ..config import settings
+
+
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+token_versions = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_TOKEN_VERSION_TTL_SECONDS)
+user_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES, settings.AUTH_USER_CACHE_TTL_SECONDS)
+
+
+def forget_user(user_id: str, token_version: Optional[int] = None) -> None:
+    """
+    Drop cached state for a user after a change; if the new token version is
+    known, record it so this worker rejects old tokens immediately.
+    """
+    user_cache.invalidate(user_id)
+    if token_version is None:
+        token_versions.invalidate(user_id)
+    else:
+        token_versions.put(user_id, token_version)
@@ -0,0 +1,203 @@
+# app/services/b2_async.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import AsyncIterator, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from . import b2_client
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncObjectBody:
+    """
+    Async wrapper around a botocore StreamingBody; every read runs on the storage executor.
+    """
+
+    def __init__(self, client: "AsyncB2Client", body):
+        self._client = client
+        self._body = body
+
+    async def read(self, amt: Optional[int] = None) -> bytes:
+        return await self._client._run(self._body.read, amt)
+
+    async def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        while True:
+            data = await self.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+    async def close(self) -> None:
+        await self._client._run(self._body.close)
+
+
+class AsyncB2Client:
+    """
+    Non-blocking facade over the boto3 S3 client.
+
+    boto3 is synchronous, so calls run on a dedicated, bounded thread pool sized to the
+    client's connection pool (B2_MAX_POOL_CONNECTIONS) instead of on the event loop.
+    Pass `s3` to use another client, e.g. one pointed at moto or MinIO in tests.
+    """
+
+    def __init__(self, s3=None, max_workers: Optional[int] = None):
+        self._s3 = s3
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.B2_MAX_POOL_CONNECTIONS,
+            thread_name_prefix="b2",
+        )
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            self._s3 = b2_client.get_s3_client()
+        return self._s3
+
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+
+    async def _call(self, op: str, **params):
+        try:
+            return await self._run(getattr(self.s3, op), **params)
+        except (BotoCoreError, ClientError) as e:
+            logger.exception("B2 %s failed: %s", op, e)
+            raise
+
+    # --------------- Upload / Download ---------------
+
+    async def upload_bytes(self, bucket: str, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        extra_args = {"ContentType": content_type} if content_type else {}
+        await self._call("put_object", Bucket=bucket, Key=key, Body=data, **extra_args)
+
+    async def download_bytes(self, bucket: str, key: str) -> bytes:
+        body, _ = await self.open_object(bucket, key)
+        try:
+            return await body.read()
+        finally:
+            await body.close()
+
+    async def open_object(
+        self, bucket: str, key: str, byte_range: Optional[Tuple[int, int]] = None
+    ) -> Tuple[AsyncObjectBody, int]:
+        """
+        Returns (AsyncObjectBody, total object size); the caller must close the body.
+        """
+        body, size = await self._run(b2_client.open_object, bucket, key, byte_range)
+        return AsyncObjectBody(self, body), size
+
+    async def delete_object(self, bucket: str, key: str) -> None:
+        await self._call("delete_object", Bucket=bucket, Key=key)
+
+    # --------------- Multipart ---------------
+
+    async def create_multipart_upload(self, bucket: str, key: str, content_type: Optional[str] = None) -> str:
+        extra_args = {"ContentType": content_type} if content_type else {}
+        resp = await self._call("create_multipart_upload", Bucket=bucket, Key=key, **extra_args)
+        return resp["UploadId"]
+
+    async def upload_part(self, bucket: str, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        resp = await self._call(
+            "upload_part", Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=data
+        )
+        return resp["ETag"]
+
+    async def complete_multipart_upload(self, bucket: str, key: str, upload_id: str, parts: list) -> None:
+        await self._call(
+            "complete_multipart_upload",
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    async def abort_multipart_upload(self, bucket: str, key: str, upload_id: str) -> None:
+        await self._call("abort_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id)
+
+    # --------------- Presigned URLs ---------------
+
+    async def generate_presigned_get(self, bucket: str, key: str, expires_in: int = 3600) -> str:
+        return await self._run(b2_client.generate_presigned_get, bucket, key, expires_in)
+
+    async def generate_presigned_put(
+        self, bucket: str, key: str, expires_in: int = 3600, content_type: Optional[str] = None
+    ) -> str:
+        return await self._run(b2_client.generate_presigned_put, bucket, key, expires_in, content_type)
+
+    async def generate_presigned_upload_part(
+        self, bucket: str, key: str, upload_id: str, part_number: int, expires_in: int = 3600
+    ) -> str:
+        return await self._run(
+            b2_client.generate_presigned_upload_part, bucket, key, upload_id, part_number, expires_in
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class AsyncMultipartWriter:
+    """
+    Writer that buffers at most one part and pushes it with S3 multipart upload,
+    without blocking the event loop. Objects smaller than one part are sent with
+    a single put_object on close(); call abort() to discard the upload.
+    """
+
+    def __init__(
+        self,
+        client: AsyncB2Client,
+        bucket: str,
+        key: str,
+        part_size: Optional[int] = None,
+        content_type: Optional[str] = None,
+    ):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size or settings.UPLOAD_PART_SIZE
+        self.content_type = content_type
+        self.bytes_written = 0
+        self._buf = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts = []
+
+    async def _flush_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = await self.client.create_multipart_upload(self.bucket, self.key, self.content_type)
+        part_number = len(self._parts) + 1
+        etag = await self.client.upload_part(self.bucket, self.key, self._upload_id, part_number, data)
+        self._parts.append({"ETag": etag, "PartNumber": part_number})
+
+    async def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self._buf += data
+        self.bytes_written += len(data)
+        while len(self._buf) >= self.part_size:
+            await self._flush_part(bytes(self._buf[:self.part_size]))
+            del self._buf[:self.part_size]
+
+    async def close(self) -> None:
+        try:
+            if self._upload_id is None:
+                await self.client.upload_bytes(self.bucket, self.key, bytes(self._buf), self.content_type)
+            else:
+                if self._buf:
+                    await self._flush_part(bytes(self._buf))
+                await self.client.complete_multipart_upload(self.bucket, self.key, self._upload_id, self._parts)
+        finally:
+            self._buf.clear()
+
+    async def abort(self) -> None:
+        self._buf.clear()
+        if self._upload_id is None:
+            return
+        try:
+            await self.client.abort_multipart_upload(self.bucket, self.key, self._upload_id)
+        except (BotoCoreError, ClientError) as e:
+            logger.warning("Failed to abort multipart upload %s: %s", self._upload_id, e)
+        self._upload_id = None
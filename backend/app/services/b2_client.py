@@ -1,6 +1,6 @@
 # app/services/b2_client.py
 import logging
-from typing import Optional
+from typing import Optional, Tuple
 import boto3
 from botocore.client import Config
 from botocore.exceptions import BotoCoreError, ClientError
@@ -15,7 +15,13 @@ def _create_s3_client():
         endpoint_url=settings.B2_ENDPOINT,
         aws_access_key_id=settings.B2_KEY_ID,
         aws_secret_access_key=settings.B2_APPLICATION_KEY,
-        config=Config(signature_version="s3v4"),
+        config=Config(
+            signature_version="s3v4",
+            max_pool_connections=settings.B2_MAX_POOL_CONNECTIONS,
+            connect_timeout=settings.B2_CONNECT_TIMEOUT,
+            read_timeout=settings.B2_READ_TIMEOUT,
+            retries={"max_attempts": settings.B2_MAX_ATTEMPTS, "mode": settings.B2_RETRY_MODE},
+        ),
         region_name=None,  # Backblaze doesn't require AWS region semantics
     )
 
@@ -61,6 +67,26 @@ def download_bytes(bucket: str, key: str) -> bytes:
         raise
 
 
+def open_object(bucket: str, key: str, byte_range: Optional[Tuple[int, int]] = None):
+    """
+    Open an object (or an inclusive byte range of it) for streaming reads.
+    Returns (botocore StreamingBody, total object size); the caller must close the body.
+    """
+    s3 = get_s3_client()
+    params = {"Bucket": bucket, "Key": key}
+    if byte_range is not None:
+        params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+    try:
+        resp = s3.get_object(**params)
+        if "ContentRange" in resp:
+            # "bytes 0-14/123456" -> total size after the slash
+            return resp["Body"], int(resp["ContentRange"].rsplit("/", 1)[1])
+        return resp["Body"], resp["ContentLength"]
+    except (BotoCoreError, ClientError) as e:
+        logger.exception("Failed to open object from B2: %s", e)
+        raise
+
+
 # --------------- Presigned URLs (optional) ---------------
 
 def generate_presigned_get(bucket: str, key: str, expires_in: int = 3600) -> str:
@@ -100,3 +126,23 @@ def generate_presigned_put(bucket: str, key: str, expires_in: int = 3600, conten
     except (BotoCoreError, ClientError) as e:
         logger.exception("Failed to generate presigned PUT URL: %s", e)
         raise
+
+
+def generate_presigned_upload_part(
+    bucket: str, key: str, upload_id: str, part_number: int, expires_in: int = 3600
+) -> str:
+    """
+    Generate a presigned PUT URL for one part of a multipart upload.
+    The client must report back the ETag header returned for each part.
+    """
+    s3 = get_s3_client()
+    try:
+        url = s3.generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+            ExpiresIn=expires_in,
+        )
+        return url
+    except (BotoCoreError, ClientError) as e:
+        logger.exception("Failed to generate presigned upload_part URL: %s", e)
+        raise
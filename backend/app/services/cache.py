@@ -0,0 +1,200 @@
+# app/services/cache.py
+"""
+Read-through cache for hot read endpoints (patient detail, file listings).
+
+Backends (CACHE_BACKEND):
+  - "memory": per-worker LRU with TTL. This is the default and the local stand-in
+    for Redis. Other workers only see a change once their entry expires
+    (CACHE_TTL_SECONDS).
+  - "redis": shared across workers via CACHE_REDIS_URL; needs the optional
+    `redis` package.
+  - "none": caching disabled.
+
+Invalidation is generation based. Every cached entity (a patient, a patient's
+file list) has a namespace whose current generation is part of each entry's
+key. Writers bump the generation after committing, which orphans every entry
+under it (all pages and limits of a listing at once). A reader that loaded
+data before a concurrent write stores it under the old generation, where it is
+never read again, so a stale fill cannot outlive the write.
+
+Values must be JSON-serialisable (they are stored as JSON in Redis). Cache
+failures are logged and treated as misses; they never fail a request.
+"""
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from ..config import settings
+from .auth_cache import TTLCache
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - optional dependency
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class MemoryCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self._values = TTLCache(max_entries, ttl_seconds)
+        # generations outlive the values keyed on them; losing one is safe (a
+        # fresh generation is issued), so they share the LRU bound, not the TTL
+        self._generations = TTLCache(max_entries, float("inf"))
+
+    async def get(self, key: str) -> Any:
+        return self._values.get(key, _MISSING)
+
+    async def set(self, key: str, value: Any) -> None:
+        self._values.put(key, value)
+
+    async def generation(self, namespace: str) -> str:
+        gen = self._generations.get(namespace)
+        if gen is None:
+            gen = str(time.time_ns())
+            self._generations.put(namespace, gen)
+        return gen
+
+    async def bump(self, namespace: str) -> None:
+        self._generations.put(namespace, str(time.time_ns()))
+
+    def stats(self) -> Dict[str, float]:
+        return self._values.stats()
+
+    async def close(self) -> None:
+        self._values.clear()
+        self._generations.clear()
+
+
+class RedisCache:
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "securecare:"):
+        if aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package (pip install redis)")
+        self._client = aioredis.from_url(url)
+        self.ttl = max(1, int(ttl_seconds))
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Any:
+        raw = await self._client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return _MISSING
+        self.hits += 1
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any) -> None:
+        await self._client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    async def generation(self, namespace: str) -> str:
+        key = self.prefix + "gen:" + namespace
+        # NX: concurrent first readers agree on one generation
+        await self._client.set(key, str(time.time_ns()), nx=True)
+        return (await self._client.get(key)).decode()
+
+    async def bump(self, namespace: str) -> None:
+        await self._client.set(self.prefix + "gen:" + namespace, str(time.time_ns()))
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def create_cache():
+    kind = settings.CACHE_BACKEND.lower()
+    if kind == "memory":
+        return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS)
+    if kind == "redis":
+        return RedisCache(settings.CACHE_REDIS_URL, settings.CACHE_TTL_SECONDS)
+    if kind == "none":
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+_cache = _MISSING
+errors = 0
+
+
+def get_cache():
+    global _cache
+    if _cache is _MISSING:
+        _cache = create_cache()
+    return _cache
+
+
+async def read_through(namespace: str, key: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Return the cached value for `key` under `namespace`, else `await load()` and
+    cache it. A None result is returned but not cached.
+    """
+    global errors
+    cache = get_cache()
+    if cache is None:
+        return await load()
+    try:
+        full_key = f"{namespace}:{await cache.generation(namespace)}:{key}"
+        value = await cache.get(full_key)
+        if value is not _MISSING:
+            return value
+    except Exception:
+        errors += 1
+        logger.exception("Cache read failed for %s", namespace)
+        return await load()
+    value = await load()
+    if value is not None:
+        try:
+            await cache.set(full_key, value)
+        except Exception:
+            errors += 1
+            logger.exception("Cache write failed for %s", namespace)
+    return value
+
+
+async def invalidate(*namespaces: str) -> None:
+    """
+    Orphan every entry cached under these namespaces. Call after the write commits.
+    """
+    global errors
+    cache = get_cache()
+    if cache is None:
+        return
+    for namespace in namespaces:
+        try:
+            await cache.bump(namespace)
+        except Exception:
+            # entries under the old generation live until their TTL
+            errors += 1
+            logger.exception("Cache invalidation failed for %s", namespace)
+
+
+def patient_ns(patient_id: int) -> str:
+    return f"patient:{patient_id}"
+
+
+def patient_files_ns(patient_id: int) -> str:
+    return f"patient-files:{patient_id}"
+
+
+def stats() -> Optional[Dict[str, float]]:
+    cache = get_cache()
+    if cache is None:
+        return None
+    return {"backend": settings.CACHE_BACKEND, "errors": errors, **cache.stats()}
+
+
+async def close_cache() -> None:
+    global _cache
+    if _cache is not _MISSING and _cache is not None:
+        await _cache.close()
+    _cache = _MISSING
@@ -1,9 +1,10 @@
 # backend/app/services/crypto.py
 import os
 import base64
-from typing import Tuple
+import struct
+from typing import Iterable, Iterator, Optional, Tuple
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet
 from app.config import settings
 
 # ---------- DEK (Data Encryption Key) helpers ----------
@@ -34,15 +35,246 @@ def decrypt_aes_gcm(nonce_and_ciphertext: bytes, dek: bytes) -> bytes:
     aesgcm = AESGCM(dek)
     return aesgcm.decrypt(nonce, ct, associated_data=None)
 
-# ---------- Wrap / Unwrap DEK using Fernet (demo only) ----------
-def _get_fernet() -> Fernet:
+# ---------- Segmented AES-GCM stream (chunked file encryption) ----------
+#
+# Layout:  header || chunk_0 || chunk_1 || ... || chunk_n
+#   header  = MAGIC (4) || chunk_size (4, big-endian) || nonce prefix (7)
+#   chunk_i = AES-GCM(plaintext[i*chunk_size:(i+1)*chunk_size]) incl. 16-byte tag
+#
+# Each chunk nonce is prefix || counter (4, big-endian) || last flag (1), and the
+# header is passed as associated data, so chunks cannot be reordered, dropped,
+# truncated or moved between files without failing authentication.
+STREAM_MAGIC = b"SCS1"
+STREAM_PREFIX_SIZE = 7
+STREAM_HEADER_SIZE = len(STREAM_MAGIC) + 4 + STREAM_PREFIX_SIZE
+STREAM_TAG_SIZE = 16
+STREAM_CHUNK_SIZE = settings.ENCRYPTION_CHUNK_SIZE
+_MAX_CHUNKS = 2 ** 32
+
+
+def _chunk_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index >= _MAX_CHUNKS:
+        raise ValueError("Stream too long for chunk counter.")
+    return prefix + struct.pack(">I", index) + (b"\x01" if last else b"\x00")
+
+
+def is_stream_ciphertext(data: bytes) -> bool:
     """
-    Return a Fernet instance using MASTER_FERNET_KEY from settings.
-    Raises if key missing.
+    True if data starts with a segmented stream header (vs. legacy nonce + ciphertext).
     """
-    key = getattr(settings, "MASTER_FERNET_KEY", None)
-    if not key:
-        raise RuntimeError("MASTER_FERNET_KEY is not set in settings/.env")
+    return data[:len(STREAM_MAGIC)] == STREAM_MAGIC
+
+
+def parse_stream_header(header: bytes) -> Tuple[int, bytes]:
+    """
+    Parse a stream header -> (chunk_size, nonce_prefix).
+    """
+    if len(header) < STREAM_HEADER_SIZE or not is_stream_ciphertext(header):
+        raise ValueError("Invalid stream header.")
+    (chunk_size,) = struct.unpack(">I", header[4:8])
+    if chunk_size <= 0:
+        raise ValueError("Invalid stream chunk size.")
+    return chunk_size, header[8:STREAM_HEADER_SIZE]
+
+
+def new_stream_header(chunk_size: int = STREAM_CHUNK_SIZE) -> bytes:
+    """
+    Create a stream header with a fresh random nonce prefix.
+    """
+    return STREAM_MAGIC + struct.pack(">I", chunk_size) + os.urandom(STREAM_PREFIX_SIZE)
+
+
+def stream_ciphertext_size(plaintext_size: int, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+    """
+    Exact stored size of a stream object for a given plaintext length.
+    """
+    chunks = max(1, -(-plaintext_size // chunk_size))
+    return STREAM_HEADER_SIZE + plaintext_size + chunks * STREAM_TAG_SIZE
+
+
+class StreamEncryptor:
+    """
+    Incremental encryptor producing the segmented stream format.
+
+    Write `header` first, then the output of every `update()` call, then `finalize()`.
+    At most one chunk of plaintext is buffered at a time. Pass `header` to encrypt
+    under a header issued elsewhere (e.g. handed to a client for direct upload).
+    """
+
+    def __init__(self, dek: bytes, chunk_size: int = STREAM_CHUNK_SIZE, header: Optional[bytes] = None):
+        if header is not None:
+            chunk_size, _ = parse_stream_header(header)
+        self.header = header[:STREAM_HEADER_SIZE] if header is not None else new_stream_header(chunk_size)
+        self._aesgcm = AESGCM(dek)
+        self._chunk_size = chunk_size
+        self._prefix = self.header[8:STREAM_HEADER_SIZE]
+        self._buf = bytearray()
+        self._index = 0
+        self._done = False
+
+    def _seal(self, chunk: bytes, last: bool) -> bytes:
+        nonce = _chunk_nonce(self._prefix, self._index, last)
+        self._index += 1
+        return self._aesgcm.encrypt(nonce, chunk, self.header)
+
+    def update(self, data: bytes) -> bytes:
+        if self._done:
+            raise ValueError("Encryptor already finalized.")
+        self._buf += data
+        out = []
+        # keep the trailing chunk buffered: only finalize() knows it is the last one
+        while len(self._buf) > self._chunk_size:
+            out.append(self._seal(bytes(self._buf[:self._chunk_size]), last=False))
+            del self._buf[:self._chunk_size]
+        return b"".join(out)
+
+    def finalize(self) -> bytes:
+        if self._done:
+            raise ValueError("Encryptor already finalized.")
+        self._done = True
+        out = self._seal(bytes(self._buf), last=True)
+        self._buf.clear()
+        return out
+
+
+class StreamDecryptor:
+    """
+    Incremental decryptor for the segmented stream format.
+    Feed ciphertext (header included) to `update()`, then call `finalize()`.
+
+    For ranged reads pass the already-fetched `header` and the index of the first
+    chunk being fed, and `finalize(last=False)` if the range stops before the end.
+    """
+
+    def __init__(self, dek: bytes, header: Optional[bytes] = None, first_index: int = 0):
+        self._aesgcm = AESGCM(dek)
+        self._buf = bytearray()
+        self._header = None
+        self._chunk_size = 0
+        self._prefix = b""
+        self._index = first_index
+        if header is not None:
+            self._header = bytes(header[:STREAM_HEADER_SIZE])
+            self._chunk_size, self._prefix = parse_stream_header(self._header)
+
+    def _open(self, chunk: bytes, last: bool) -> bytes:
+        nonce = _chunk_nonce(self._prefix, self._index, last)
+        self._index += 1
+        return self._aesgcm.decrypt(nonce, chunk, self._header)
+
+    def update(self, data: bytes) -> bytes:
+        self._buf += data
+        if self._header is None:
+            if len(self._buf) < STREAM_HEADER_SIZE:
+                return b""
+            self._header = bytes(self._buf[:STREAM_HEADER_SIZE])
+            self._chunk_size, self._prefix = parse_stream_header(self._header)
+            del self._buf[:STREAM_HEADER_SIZE]
+
+        sealed = self._chunk_size + STREAM_TAG_SIZE
+        out = []
+        while len(self._buf) > sealed:
+            out.append(self._open(bytes(self._buf[:sealed]), last=False))
+            del self._buf[:sealed]
+        return b"".join(out)
+
+    def finalize(self, last: bool = True) -> bytes:
+        if self._header is None or len(self._buf) < STREAM_TAG_SIZE:
+            raise ValueError("Invalid ciphertext (truncated stream).")
+        out = self._open(bytes(self._buf), last=last)
+        self._buf.clear()
+        return out
+
+
+def stream_plaintext_size(ciphertext_size: int, chunk_size: int) -> int:
+    """
+    Plaintext length of a stream object, computed from its ciphertext framing alone.
+    """
+    body = ciphertext_size - STREAM_HEADER_SIZE
+    sealed = chunk_size + STREAM_TAG_SIZE
+    if body < STREAM_TAG_SIZE:
+        raise ValueError("Invalid ciphertext (too short).")
+    full, rest = divmod(body, sealed)
+    if rest == 0:
+        return full * chunk_size
+    if rest < STREAM_TAG_SIZE:
+        raise ValueError("Invalid ciphertext (bad framing).")
+    return full * chunk_size + rest - STREAM_TAG_SIZE
+
+
+def decrypt_stream(chunks: Iterable[bytes], dek: bytes) -> Iterator[bytes]:
+    """
+    Decrypt an iterable of ciphertext pieces (any sizes), yielding plaintext as
+    soon as each chunk has been authenticated.
+    """
+    dec = StreamDecryptor(dek)
+    for piece in chunks:
+        out = dec.update(piece)
+        if out:
+            yield out
+    out = dec.finalize()
+    if out:
+        yield out
+
+
+def stream_range_span(start: int, end: int, header: bytes, ciphertext_size: int) -> Tuple[int, int]:
+    """
+    Map an inclusive plaintext byte range to the inclusive ciphertext byte range
+    covering the minimal set of chunks that contain it.
+    """
+    chunk_size, _ = parse_stream_header(header)
+    sealed = chunk_size + STREAM_TAG_SIZE
+    first, last = start // chunk_size, end // chunk_size
+    ct_start = STREAM_HEADER_SIZE + first * sealed
+    ct_end = min(STREAM_HEADER_SIZE + (last + 1) * sealed, ciphertext_size) - 1
+    return ct_start, ct_end
+
+
+class StreamRangeDecryptor:
+    """
+    Push-style decryptor for the ciphertext span returned by `stream_range_span`.
+    Output across `update()`/`finalize()` is exactly plaintext[start:end + 1].
+    """
+
+    def __init__(self, dek: bytes, header: bytes, start: int, end: int, ciphertext_size: int):
+        chunk_size, _ = parse_stream_header(header)
+        sealed = chunk_size + STREAM_TAG_SIZE
+        first = start // chunk_size
+        last_chunk = -(-(ciphertext_size - STREAM_HEADER_SIZE) // sealed) - 1
+        self._dec = StreamDecryptor(dek, header=header, first_index=first)
+        self._ends_stream = (end // chunk_size) == last_chunk
+        self._skip = start - first * chunk_size
+        self._remaining = end - start + 1
+
+    def _trim(self, out: bytes) -> bytes:
+        if self._skip:
+            cut = min(self._skip, len(out))
+            out, self._skip = out[cut:], self._skip - cut
+        out = out[:self._remaining]
+        self._remaining -= len(out)
+        return out
+
+    def update(self, data: bytes) -> bytes:
+        return self._trim(self._dec.update(data))
+
+    def finalize(self) -> bytes:
+        return self._trim(self._dec.finalize(last=self._ends_stream))
+
+
+def decrypt_file_bytes(data: bytes, dek: bytes) -> bytes:
+    """
+    Decrypt a whole stored object, either segmented stream or legacy nonce + ciphertext.
+    """
+    if not is_stream_ciphertext(data):
+        return decrypt_aes_gcm(data, dek)
+    dec = StreamDecryptor(dek)
+    return dec.update(data) + dec.finalize()
+
+# ---------- Wrap / Unwrap DEK using a versioned Fernet key ring (demo only) ----------
+_fernet = None
+
+
+def _load_key(key) -> Fernet:
     # ensure bytes
     if isinstance(key, str):
         key_b = key.encode()
@@ -50,9 +282,42 @@ def _get_fernet() -> Fernet:
         key_b = key
     return Fernet(key_b)
 
+
+def init_master_key() -> MultiFernet:
+    """
+    Build the master key ring once (call on startup). MASTER_FERNET_KEY is the
+    primary (current version) key used for new wraps; MASTER_FERNET_OLD_KEYS
+    (comma-separated, newest first) are only tried when unwrapping.
+    Raises if key missing.
+    """
+    global _fernet
+    key = getattr(settings, "MASTER_FERNET_KEY", None)
+    if not key:
+        raise RuntimeError("MASTER_FERNET_KEY is not set in settings/.env")
+    old_keys = [k.strip() for k in settings.MASTER_FERNET_OLD_KEYS.split(",") if k.strip()]
+    _fernet = MultiFernet([_load_key(key)] + [_load_key(k) for k in old_keys])
+    return _fernet
+
+
+def _get_fernet() -> MultiFernet:
+    """
+    Return the process-wide key ring, building it on first use.
+    """
+    if _fernet is None:
+        return init_master_key()
+    return _fernet
+
+
+def current_key_version() -> int:
+    """
+    Version of the primary master key; stored on each FileRecord it wraps.
+    """
+    return settings.MASTER_KEY_VERSION
+
+
 def wrap_dek(dek: bytes) -> str:
     """
-    Wrap (encrypt) a DEK using the master Fernet key.
+    Wrap (encrypt) a DEK using the current master key.
     Returns a Fernet token string (utf-8).
     """
     f = _get_fernet()
@@ -63,10 +328,18 @@ def wrap_dek(dek: bytes) -> str:
 def unwrap_dek(wrapped_token: str) -> bytes:
     """
     Unwrap (decrypt) a wrapped DEK token (string) -> raw DEK bytes.
+    Accepts tokens wrapped by the current or any retired master key.
     """
     f = _get_fernet()
     return f.decrypt(wrapped_token.encode())
 
+def rewrap_dek(wrapped_token: str) -> str:
+    """
+    Re-wrap a token under the current master key without exposing the DEK to the caller.
+    """
+    f = _get_fernet()
+    return f.rotate(wrapped_token.encode()).decode()
+
 # ---------- Convenience: base64 helpers ----------
 def encode_b64(data: bytes) -> str:
     return base64.b64encode(data).decode()
@@ -0,0 +1,103 @@
+# app/services/dek_cache.py
+"""
+In-process cache of unwrapped DEKs.
+
+Viewer pages fetch the same files over and over; each fetch would otherwise pay a
+Fernet HMAC + AES decrypt to unwrap the file key. Entries are keyed by FileRecord.id
+plus a hash of the wrapped token (so a re-wrapped or replaced key never hits a stale
+entry), expire after a TTL, are evicted LRU-first, and are zeroed when dropped.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from . import crypto
+from ..config import settings
+
+
+def _zero(buf: bytearray) -> None:
+    buf[:] = bytes(len(buf))
+
+
+class DEKCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[int, bytes], Tuple[bytearray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(file_id: int, wrapped_token: str) -> Tuple[int, bytes]:
+        return file_id, hashlib.sha256(wrapped_token.encode()).digest()
+
+    def _drop(self, key) -> None:
+        buf, _ = self._entries.pop(key)
+        _zero(buf)
+
+    def get_dek(self, file_id: int, wrapped_token: str) -> bytes:
+        """
+        Return the unwrapped DEK for a file, unwrapping through crypto on a miss.
+        Callers get their own copy, so zeroing an evicted entry never corrupts
+        a decryption that is still in flight.
+        """
+        key = self._key(file_id, wrapped_token)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                buf, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return bytes(buf)
+                self._drop(key)
+                self.expirations += 1
+            self.misses += 1
+
+        dek = crypto.unwrap_dek(wrapped_token)
+        if self.max_entries <= 0:
+            return dek
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (bytearray(dek), now + self.ttl_seconds)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return dek
+
+    def invalidate(self, file_id: int) -> None:
+        """
+        Drop every cached DEK for a file (e.g. when the file is deleted).
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == file_id]:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+dek_cache = DEKCache(settings.DEK_CACHE_MAX_ENTRIES, settings.DEK_CACHE_TTL_SECONDS)
@@ -0,0 +1,89 @@
+# app/services/passwords.py
+"""
+Password hashing on a dedicated, bounded process pool.
+
+bcrypt is deliberately slow CPU work (~250 ms at 12 rounds). Running it on the
+request threadpool lets a login storm starve every other endpoint, so hashes are
+computed in a small process pool instead. At most PASSWORD_HASH_MAX_PENDING calls
+may be queued or running per worker; beyond that PasswordPoolBusy is raised and
+the route answers 429 rather than letting latency grow without bound.
+
+The cost factor comes from BCRYPT_ROUNDS. Hashes made with any other cost are
+flagged by verify_and_update, which returns a fresh hash to store on login.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from ..config import settings
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    # pin min/max to the default so any change of cost (up or down) triggers a rehash
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+class PasswordPoolBusy(Exception):
+    """Too many hash operations queued; the caller should retry later."""
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+    return _executor
+
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordPoolBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update_sync(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+async def hash_password(password: str) -> str:
+    return await _submit(hash_password_sync, password)
+
+
+async def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """
+    Returns (ok, new_hash); new_hash is set when the stored hash uses another cost.
+    """
+    return await _submit(verify_and_update_sync, password, hashed)
+
+
+def pool_stats() -> dict:
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "pending": _pending,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+    }
+
+
+def close_password_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
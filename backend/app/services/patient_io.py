@@ -0,0 +1,163 @@
+# app/services/patient_io.py
+"""
+Bulk patient import and export (CSV or NDJSON).
+
+Import reads the input incrementally: every PATIENT_IMPORT_BATCH_SIZE records
+are parsed and validated against schemas.PatientCreate on a worker thread, then
+inserted with one executemany in their own transaction. Invalid records are
+skipped and reported by line number; earlier batches stay committed if a later
+one fails. Unknown columns (e.g. `id` / `created_at` from an export) are ignored,
+so an export can be imported back as new records.
+
+Export streams rows from a server-side cursor (asyncpg) or a chunked cursor
+(SQLite), PATIENT_EXPORT_FETCH_SIZE at a time, so memory does not grow with the
+table.
+"""
+import csv
+import datetime
+import io
+import itertools
+import json
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import select
+from starlette.concurrency import run_in_threadpool
+
+from .. import crud
+from ..config import settings
+from ..db import async_engine, async_session_factory
+from ..models import Patient
+from ..schemas import PatientCreate
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+_EXTENSIONS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+def format_for(filename: str) -> str:
+    """
+    Guess the format from a file name; returns "" when it cannot tell.
+    """
+    name = (filename or "").lower()
+    return next((fmt for ext, fmt in _EXTENSIONS.items() if name.endswith(ext)), "")
+
+
+# ---------------- import ----------------
+def _records(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield (line number, raw record) pairs; NDJSON lines are decoded later so a
+    malformed line is reported like any other invalid record.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # empty cells mean "not given", not an empty string
+            yield reader.line_num, {k: v for k, v in row.items() if k and v not in ("", None)}
+    else:
+        for number, line in enumerate(text, 1):
+            if line.strip():
+                yield number, line
+
+
+def _next_batch(records: Iterator[Tuple[int, Any]], size: int):
+    """
+    Validate up to `size` records. Returns (rows, their line numbers, errors,
+    whether more input may follow).
+    """
+    rows, lines, errors, seen = [], [], [], 0
+    try:
+        for number, raw in itertools.islice(records, size):
+            seen += 1
+            try:
+                data = json.loads(raw) if isinstance(raw, str) else raw
+                if not isinstance(data, dict):
+                    raise ValueError("expected an object")
+                rows.append(PatientCreate.model_validate(data).model_dump())
+                lines.append(number)
+            except ValidationError as e:
+                errors.append({
+                    "line": number,
+                    "errors": [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()],
+                })
+            except ValueError as e:
+                errors.append({"line": number, "errors": [str(e)]})
+    except (UnicodeDecodeError, csv.Error) as e:
+        # the reader cannot resume past this point
+        errors.append({"line": None, "errors": [f"unreadable input, import stopped: {e}"]})
+        return rows, lines, errors, False
+    return rows, lines, errors, seen == size
+
+
+async def import_patients(stream: BinaryIO, fmt: str) -> Dict[str, Any]:
+    """
+    Import patients from a binary file object. Returns the report:
+    {"inserted", "failed", "errors": [{"line", "errors"}], "errors_truncated"}.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt!r}")
+    records = _records(stream, fmt)
+    report: Dict[str, Any] = {"inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+
+    def note(errors: List[dict]) -> None:
+        report["failed"] += len(errors)
+        room = settings.PATIENT_IMPORT_MAX_ERRORS - len(report["errors"])
+        report["errors"] += errors[: max(room, 0)]
+        report["errors_truncated"] |= len(errors) > room
+
+    more = True
+    while more:
+        # parsing and validation are CPU work; keep them off the event loop
+        rows, lines, errors, more = await run_in_threadpool(
+            _next_batch, records, settings.PATIENT_IMPORT_BATCH_SIZE
+        )
+        note(errors)
+        if rows:
+            try:
+                async with async_session_factory() as session:
+                    report["inserted"] += await crud.create_patients(session, rows)
+            except SQLAlchemyError as e:
+                # the whole batch rolled back; report every row in it
+                reason = f"batch rejected by the database: {e.__class__.__name__}"
+                note([{"line": n, "errors": [reason]} for n in lines])
+    return report
+
+
+# ---------------- export ----------------
+_EXPORT_COLUMNS = crud.PATIENT_FIELDS
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+def _encode(rows, fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(json.dumps({c: _plain(v) for c, v in zip(_EXPORT_COLUMNS, r)}) + "\n" for r in rows)
+    out = io.StringIO()
+    csv.writer(out).writerows([_plain(v) for v in r] for r in rows)
+    return out.getvalue()
+
+
+async def export_patients(fmt: str) -> AsyncIterator[str]:
+    """
+    Yield the whole patient table, oldest first, as CSV (with header) or NDJSON.
+    Opens its own connection: a streamed response outlives the request's session.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt!r}")
+    if fmt == "csv":
+        out = io.StringIO()
+        csv.writer(out).writerow(_EXPORT_COLUMNS)
+        yield out.getvalue()
+    statement = (
+        select(*(getattr(Patient, c) for c in _EXPORT_COLUMNS))
+        .order_by(Patient.created_at, Patient.id)
+        .execution_options(yield_per=settings.PATIENT_EXPORT_FETCH_SIZE)
+    )
+    async with async_engine.connect() as conn:
+        result = await conn.stream(statement)
+        async for rows in result.partitions():
+            yield _encode(rows, fmt)
@@ -0,0 +1,54 @@
+# app/services/rate_limit.py
+"""
+In-process token-bucket rate limiting (per worker).
+
+Each key (client IP, account name, ...) gets a bucket of `limit` tokens that
+refills continuously over `window_seconds`. Buckets are kept in an LRU map capped
+at `max_keys`, so a flood of distinct keys cannot grow memory without bound.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Tuple
+
+from ..config import settings
+
+
+class RateLimiter:
+    def __init__(self, limit: int, window_seconds: float, max_keys: int = 100_000):
+        self.limit = limit
+        self.rate = limit / window_seconds
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def hit(self, key: Hashable) -> float:
+        """
+        Take one token for `key`. Returns 0.0 if allowed, otherwise the number
+        of seconds until a token is available.
+        """
+        if self.limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (float(self.limit), now))
+            tokens = min(self.limit, tokens + (now - last) * self.rate)
+            if tokens >= 1.0:
+                self._buckets[key] = (tokens - 1.0, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                self.rejected += 1
+                wait = (1.0 - tokens) / self.rate
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"keys": len(self._buckets), "limit": self.limit, "rejected": self.rejected}
+
+
+login_ip_limiter = RateLimiter(settings.LOGIN_RATE_PER_IP, settings.LOGIN_RATE_WINDOW_SECONDS)
+login_account_limiter = RateLimiter(settings.LOGIN_RATE_PER_ACCOUNT, settings.LOGIN_RATE_WINDOW_SECONDS)
@@ -0,0 +1,186 @@
+# app/services/schedule.py
+"""
+In-memory booking index for appointment scheduling (per worker).
+
+Each doctor's active (non-cancelled) upcoming appointments are kept as parallel
+lists sorted by start time. An overlap check is two bisects plus a scan of the
+few bookings starting within `max_len` before the candidate, where max_len is
+the longest booking held. Since a doctor's bookings are mostly disjoint, this
+gives what an interval tree would, at O(log n) per check, with plain lists.
+Free-slot and first-available searches walk the gaps in start order.
+
+The database stays the source of truth. Bookings are re-checked there inside
+the per-doctor booking lock, and Postgres additionally enforces an exclusion
+constraint (see POSTGRES_DDL). Another worker's bookings reach this index when
+the doctor's entry is reloaded after SCHEDULE_INDEX_TTL_SECONDS, or right away
+when a booking here hits a conflict the index did not know about.
+"""
+import asyncio
+import bisect
+import datetime
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .. import crud
+from ..config import settings
+
+Interval = Tuple[datetime.datetime, datetime.datetime]
+
+# Postgres: no two active bookings of a doctor may overlap, even across workers
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    """DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ex_appointment_doctor_overlap') THEN
+            ALTER TABLE appointment ADD CONSTRAINT ex_appointment_doctor_overlap
+                EXCLUDE USING gist (doctor_id WITH =, tsrange(start_at, end_at) WITH &&)
+                WHERE (status <> 'cancelled' AND doctor_id IS NOT NULL AND end_at IS NOT NULL);
+        END IF;
+    END $$""",
+]
+
+
+def ensure_schedule_constraints(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        for ddl in POSTGRES_DDL:
+            conn.execute(text(ddl))
+
+
+class DoctorSchedule:
+    __slots__ = ("starts", "ends", "ids", "max_len", "loaded_at")
+
+    def __init__(self, bookings: Iterable[Tuple[int, datetime.datetime, datetime.datetime]] = ()):
+        rows = sorted(bookings, key=lambda b: (b[1], b[0]))
+        self.ids = [r[0] for r in rows]
+        self.starts = [r[1] for r in rows]
+        self.ends = [r[2] for r in rows]
+        self.max_len = max((e - s for _, s, e in rows), default=datetime.timedelta(0))
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def conflicts(
+        self, start: datetime.datetime, end: datetime.datetime, exclude_id: Optional[int] = None
+    ) -> List[int]:
+        """
+        Ids of bookings overlapping [start, end).
+        """
+        lo = bisect.bisect_right(self.starts, start - self.max_len)
+        hi = bisect.bisect_left(self.starts, end)
+        return [
+            self.ids[i] for i in range(lo, hi)
+            if self.ends[i] > start and self.ids[i] != exclude_id
+        ]
+
+    def add(self, appointment_id: int, start: datetime.datetime, end: datetime.datetime) -> None:
+        i = bisect.bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.ids.insert(i, appointment_id)
+        self.max_len = max(self.max_len, end - start)
+
+    def remove(self, appointment_id: int) -> None:
+        if appointment_id in self.ids:
+            i = self.ids.index(appointment_id)
+            del self.starts[i], self.ends[i], self.ids[i]
+
+    def gaps(self, since: datetime.datetime, until: datetime.datetime) -> Iterable[Interval]:
+        """
+        Free intervals within [since, until), in order.
+        """
+        cursor = since
+        i = bisect.bisect_right(self.starts, since - self.max_len)
+        while i < len(self.starts) and self.starts[i] < until:
+            if self.starts[i] > cursor:
+                yield cursor, self.starts[i]
+            cursor = max(cursor, self.ends[i])
+            i += 1
+        if cursor < until:
+            yield cursor, until
+
+
+def working_windows(since: datetime.datetime, until: datetime.datetime) -> Iterable[Interval]:
+    """
+    The bookable hours of each day, clipped to [since, until).
+    """
+    day = datetime.datetime.combine(since.date(), datetime.time())
+    while day < until:
+        lo = max(since, day + datetime.timedelta(hours=settings.SCHEDULE_DAY_START_HOUR))
+        hi = min(until, day + datetime.timedelta(hours=settings.SCHEDULE_DAY_END_HOUR))
+        if lo < hi:
+            yield lo, hi
+        day += datetime.timedelta(days=1)
+
+
+def free_slots(
+    schedule: DoctorSchedule, since: datetime.datetime, until: datetime.datetime, duration: datetime.timedelta
+) -> List[Interval]:
+    """
+    Free stretches of bookable time within [since, until) at least `duration` long.
+    """
+    slots = []
+    for lo, hi in working_windows(since, until):
+        slots += [(s, e) for s, e in schedule.gaps(lo, hi) if e - s >= duration]
+    return slots
+
+
+def first_free(
+    schedule: DoctorSchedule, since: datetime.datetime, until: datetime.datetime, duration: datetime.timedelta
+) -> Optional[datetime.datetime]:
+    for lo, hi in working_windows(since, until):
+        for s, e in schedule.gaps(lo, hi):
+            if e - s >= duration:
+                return s
+    return None
+
+
+class ScheduleIndex:
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._doctors: Dict[str, DoctorSchedule] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.loads = 0
+
+    def lock(self, doctor_id: str) -> asyncio.Lock:
+        """
+        Serialises check-then-book for one doctor within this worker.
+        """
+        return self._locks.setdefault(doctor_id, asyncio.Lock())
+
+    async def get_many(self, session: AsyncSession, doctor_ids: List[str]) -> Dict[str, DoctorSchedule]:
+        """
+        Schedules for these doctors; missing or expired ones are (re)loaded
+        together in a single query.
+        """
+        now = time.monotonic()
+        stale = [d for d in dict.fromkeys(doctor_ids)
+                 if d not in self._doctors or now - self._doctors[d].loaded_at > self.ttl_seconds]
+        if stale:
+            rows = await crud.list_booked_intervals(session, stale, datetime.datetime.utcnow())
+            by_doctor: Dict[str, list] = {d: [] for d in stale}
+            for doctor_id, appointment_id, start, end in rows:
+                by_doctor[doctor_id].append((appointment_id, start, end))
+            for doctor_id, bookings in by_doctor.items():
+                self._doctors[doctor_id] = DoctorSchedule(bookings)
+            self.loads += 1
+        return {d: self._doctors[d] for d in doctor_ids}
+
+    async def get(self, session: AsyncSession, doctor_id: str) -> DoctorSchedule:
+        return (await self.get_many(session, [doctor_id]))[doctor_id]
+
+    def invalidate(self, doctor_id: str) -> None:
+        self._doctors.pop(doctor_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "doctors": len(self._doctors),
+            "bookings": sum(len(s) for s in self._doctors.values()),
+            "loads": self.loads,
+        }
+
+
+schedule_index = ScheduleIndex(settings.SCHEDULE_INDEX_TTL_SECONDS)
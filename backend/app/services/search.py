@@ -0,0 +1,95 @@
+# app/services/search.py
+"""
+Full-text index over patient records.
+
+  - SQLite: an external-content FTS5 table `patient_fts` (with prefix indexes for
+    typeahead) kept in sync with `patient` by AFTER INSERT/UPDATE/DELETE triggers.
+  - Postgres: a generated, weighted `patient.search_vector` tsvector column with
+    a GIN index, which Postgres maintains on every write.
+
+Either way the index follows every write path (CRUD helpers, bulk imports, raw
+SQL) without application code having to remember it. ensure_search_index() is
+idempotent and runs from init_db; the Alembic migration applies the same DDL.
+"""
+import re
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from ..config import settings
+
+# indexed columns, most to least important (ranking weights follow this order)
+SEARCH_COLUMNS = ("name", "condition", "allergies", "current_medications", "medical_history")
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 2.0, 2.0, 1.0)
+
+_cols = ", ".join(SEARCH_COLUMNS)
+_new = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+_old = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5(
+        {_cols},
+        content='patient', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_fts_ai AFTER INSERT ON patient BEGIN
+        INSERT INTO patient_fts(rowid, {_cols}) VALUES (new.id, {_new});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_fts_ad AFTER DELETE ON patient BEGIN
+        INSERT INTO patient_fts(patient_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_fts_au AFTER UPDATE OF {_cols} ON patient BEGIN
+        INSERT INTO patient_fts(patient_fts, rowid, {_cols}) VALUES ('delete', old.id, {_old});
+        INSERT INTO patient_fts(rowid, {_cols}) VALUES (new.id, {_new});
+    END""",
+]
+
+POSTGRES_DDL = [
+    """ALTER TABLE patient ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(condition, '')), 'B') ||
+            setweight(to_tsvector('simple',
+                coalesce(allergies, '') || ' ' || coalesce(current_medications, '')), 'C') ||
+            setweight(to_tsvector('simple', coalesce(medical_history, '')), 'D')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_patient_search_vector ON patient USING GIN (search_vector)",
+]
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def ensure_search_index(conn: Connection) -> None:
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        fresh = conn.execute(text(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = 'patient_fts'"
+        )).scalar() == 0
+        for ddl in SQLITE_DDL:
+            conn.execute(text(ddl))
+        if fresh:
+            # index rows that existed before the triggers did
+            conn.execute(text("INSERT INTO patient_fts(patient_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for ddl in POSTGRES_DDL:
+            conn.execute(text(ddl))
+
+
+def search_terms(query: str) -> List[str]:
+    """
+    Split a free-text query into lowercase word terms. Punctuation never reaches
+    the MATCH / tsquery syntax, and very short terms (too broad to rank
+    cheaply) are dropped.
+    """
+    terms = [t.lower() for t in _TERM.findall(query or "") if len(t) >= settings.SEARCH_MIN_TERM_CHARS]
+    return terms[: settings.SEARCH_MAX_TERMS]
+
+
+def sqlite_match(terms: List[str]) -> str:
+    # every term must match, each as a prefix: "ali"* "asth"*
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def postgres_tsquery(terms: List[str]) -> str:
+    return " & ".join(f"{t}:*" for t in terms)
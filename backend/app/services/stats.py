@@ -0,0 +1,184 @@
+# app/services/stats.py
+"""
+Incrementally maintained dashboard counters.
+
+Each (metric, key) pair is one StatCounter row. Write paths call bump() inside
+their own transaction, so a counter commits or rolls back together with the
+change it counts:
+
+  patients_total                     ""            create / bulk import / delete patient
+  patients_by_condition              condition     create / import / update / delete patient
+  files_total                        ""            create / delete file record
+  files_by_patient                   patient id    create / delete file record
+  uploads_by_day                     YYYY-MM-DD    create / delete file record (files still stored)
+  doctor_last_seen                   user id       audit writer: latest event by a doctor (epoch s)
+
+Updates are single-statement upserts (ON CONFLICT DO UPDATE on SQLite and
+Postgres), so concurrent writers never lose an increment. rebuild() recomputes
+everything from the base tables, e.g. after a restore or a manual data fix
+(scripts/rebuild_stats.py).
+"""
+import datetime
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import String, cast, delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..models import AuditLog, FileRecord, Patient, StatCounter
+
+PATIENTS_TOTAL = "patients_total"
+PATIENTS_BY_CONDITION = "patients_by_condition"
+FILES_TOTAL = "files_total"
+FILES_BY_PATIENT = "files_by_patient"
+UPLOADS_BY_DAY = "uploads_by_day"
+DOCTOR_LAST_SEEN = "doctor_last_seen"
+
+_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+_REBUILD_CHUNK = 1000
+
+
+def condition_key(condition: Optional[str]) -> str:
+    # same normalisation as rebuild()'s SQL trim(coalesce(condition, ''))
+    return (condition or "").strip(" ")
+
+
+def day_key(ts: datetime.datetime) -> str:
+    return ts.date().isoformat()
+
+
+def epoch(ts: datetime.datetime) -> int:
+    return int(ts.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def upsert(dialect: str, values: Dict[Tuple[str, str], int], keep_max: bool = False):
+    """
+    One multi-row upsert adding each value to its counter (or keeping the
+    larger of the two with keep_max). Returns None when there is nothing to do.
+    """
+    rows = [{"metric": m, "key": k, "value": v} for (m, k), v in values.items() if v or keep_max]
+    if not rows:
+        return None
+    stmt = _INSERTS[dialect](StatCounter).values(rows)
+    if keep_max:
+        larger = func.greatest if dialect == "postgresql" else func.max
+        value = larger(StatCounter.value, stmt.excluded.value)
+    else:
+        value = StatCounter.value + stmt.excluded.value
+    return stmt.on_conflict_do_update(index_elements=["metric", "key"], set_={"value": value})
+
+
+async def bump(session: AsyncSession, deltas: Dict[Tuple[str, str], int]) -> None:
+    """
+    Apply counter deltas in the session's transaction (the caller commits).
+    """
+    stmt = upsert(session.bind.dialect.name, deltas)
+    if stmt is not None:
+        await session.exec(stmt)
+
+
+def patient_deltas(conditions: Iterable[Optional[str]], sign: int = 1) -> Dict[Tuple[str, str], int]:
+    deltas: Counter = Counter()
+    for condition in conditions:
+        deltas[(PATIENTS_TOTAL, "")] += sign
+        deltas[(PATIENTS_BY_CONDITION, condition_key(condition))] += sign
+    return deltas
+
+
+def file_deltas(files: Iterable[Tuple[int, datetime.datetime]], sign: int = 1) -> Dict[Tuple[str, str], int]:
+    """
+    `files` are (patient_id, uploaded_at) pairs.
+    """
+    deltas: Counter = Counter()
+    for patient_id, uploaded_at in files:
+        deltas[(FILES_TOTAL, "")] += sign
+        deltas[(FILES_BY_PATIENT, str(patient_id))] += sign
+        deltas[(UPLOADS_BY_DAY, day_key(uploaded_at))] += sign
+    return deltas
+
+
+def doctor_activity(events: Iterable[dict]) -> Dict[Tuple[str, str], int]:
+    """
+    Latest event time per doctor among audit rows (dicts as written by the audit writer).
+    """
+    seen: Dict[Tuple[str, str], int] = {}
+    for e in events:
+        if e.get("actor_role") == "doctor" and e.get("actor_id"):
+            key = (DOCTOR_LAST_SEEN, e["actor_id"])
+            seen[key] = max(seen.get(key, 0), epoch(e["timestamp"]))
+    return seen
+
+
+# ---------------- reads ----------------
+async def get_value(session: AsyncSession, metric: str, key: str = "") -> int:
+    row = await session.get(StatCounter, (metric, key))
+    return row.value if row else 0
+
+
+async def top(session: AsyncSession, metric: str, limit: int) -> List[StatCounter]:
+    statement = (
+        select(StatCounter)
+        .where(StatCounter.metric == metric, StatCounter.value > 0)
+        .order_by(StatCounter.value.desc(), StatCounter.key)
+        .limit(limit)
+    )
+    return list((await session.exec(statement)).all())
+
+
+async def key_range(session: AsyncSession, metric: str, first: str, last: str) -> List[StatCounter]:
+    statement = (
+        select(StatCounter)
+        .where(StatCounter.metric == metric, StatCounter.key >= first, StatCounter.key <= last)
+        .order_by(StatCounter.key)
+    )
+    return list((await session.exec(statement)).all())
+
+
+async def count_at_least(session: AsyncSession, metric: str, minimum: int) -> int:
+    statement = select(func.count()).select_from(StatCounter).where(
+        StatCounter.metric == metric, StatCounter.value >= minimum
+    )
+    return (await session.exec(statement)).one()
+
+
+# ---------------- rebuild ----------------
+async def rebuild(session: AsyncSession) -> int:
+    """
+    Recompute every counter from the base tables in one transaction.
+    Returns the number of counter rows written.
+    """
+    values: Dict[Tuple[str, str], int] = {}
+
+    total = (await session.exec(select(func.count()).select_from(Patient))).one()
+    values[(PATIENTS_TOTAL, "")] = total
+    by_condition = select(func.trim(func.coalesce(Patient.condition, "")), func.count()).group_by(
+        func.trim(func.coalesce(Patient.condition, ""))
+    )
+    for condition, n in (await session.exec(by_condition)).all():
+        values[(PATIENTS_BY_CONDITION, condition)] = n
+
+    values[(FILES_TOTAL, "")] = (await session.exec(select(func.count()).select_from(FileRecord))).one()
+    by_patient = select(FileRecord.patient_id, func.count()).group_by(FileRecord.patient_id)
+    for patient_id, n in (await session.exec(by_patient)).all():
+        values[(FILES_BY_PATIENT, str(patient_id))] = n
+    day = cast(func.date(FileRecord.uploaded_at), String)
+    for d, n in (await session.exec(select(day, func.count()).group_by(day))).all():
+        values[(UPLOADS_BY_DAY, d)] = n
+
+    last_seen = (
+        select(AuditLog.actor_id, func.max(AuditLog.timestamp))
+        .where(AuditLog.actor_role == "doctor", AuditLog.actor_id.is_not(None))
+        .group_by(AuditLog.actor_id)
+    )
+    for actor_id, ts in (await session.exec(last_seen)).all():
+        values[(DOCTOR_LAST_SEEN, actor_id)] = epoch(ts)
+
+    await session.exec(delete(StatCounter))
+    items = list(values.items())
+    for i in range(0, len(items), _REBUILD_CHUNK):
+        # keep each statement under SQLite's bound-parameter limit
+        await session.exec(upsert(session.bind.dialect.name, dict(items[i:i + _REBUILD_CHUNK]), keep_max=True))
+    await session.commit()
+    return len(values)
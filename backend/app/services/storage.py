@@ -0,0 +1,370 @@
+# app/services/storage.py
+"""
+Pluggable object storage used by the file routes.
+
+STORAGE_BACKEND selects the implementation:
+  - "s3":     Backblaze B2 / any S3-compatible store (default)
+  - "local":  a directory on local disk (on-prem sites, hot files on NVMe)
+  - "memory": process memory (load tests / benchmarks without network latency)
+"""
+import asyncio
+import mmap
+import os
+import uuid
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from .b2_async import AsyncB2Client, AsyncMultipartWriter
+from ..config import settings
+
+
+class ObjectBody(ABC):
+    """
+    Readable object body returned by StorageBackend.open().
+    """
+
+    @abstractmethod
+    async def read(self, amt: Optional[int] = None) -> bytes:
+        ...
+
+    async def iter_chunks(self, chunk_size: int) -> AsyncIterator[bytes]:
+        while True:
+            data = await self.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+    async def close(self) -> None:
+        pass
+
+
+class ObjectWriter(ABC):
+    """
+    Incremental writer returned by StorageBackend.open_writer().
+    The object only becomes visible after close(); abort() discards it.
+    """
+
+    @abstractmethod
+    async def write(self, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def close(self) -> None:
+        ...
+
+    @abstractmethod
+    async def abort(self) -> None:
+        ...
+
+
+class StorageBackend(ABC):
+    name = "abstract"
+
+    @abstractmethod
+    def open_writer(self, key: str, content_type: Optional[str] = None) -> ObjectWriter:
+        ...
+
+    @abstractmethod
+    async def open(self, key: str, byte_range: Optional[Tuple[int, int]] = None) -> Tuple[ObjectBody, int]:
+        """
+        Open an object (or an inclusive byte range of it).
+        Returns (body, total object size); the caller must close the body.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def put_bytes(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        writer = self.open_writer(key, content_type)
+        try:
+            await writer.write(data)
+            await writer.close()
+        except Exception:
+            await writer.abort()
+            raise
+
+    async def read_bytes(self, key: str) -> bytes:
+        body, _ = await self.open(key)
+        try:
+            return await body.read()
+        finally:
+            await body.close()
+
+    async def presign_get(self, key: str, expires_in: int = 3600) -> str:
+        raise NotImplementedError(f"{self.name} storage does not support presigned URLs")
+
+    # ---- direct-to-storage multipart uploads (presigned parts) ----
+
+    async def create_multipart(self, key: str, content_type: Optional[str] = None) -> str:
+        raise NotImplementedError(f"{self.name} storage does not support direct uploads")
+
+    async def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires_in: int = 3600) -> str:
+        raise NotImplementedError(f"{self.name} storage does not support direct uploads")
+
+    async def complete_multipart(self, key: str, upload_id: str, parts: list) -> None:
+        raise NotImplementedError(f"{self.name} storage does not support direct uploads")
+
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        raise NotImplementedError(f"{self.name} storage does not support direct uploads")
+
+    def close(self) -> None:
+        pass
+
+
+# ============================================================
+# S3 / Backblaze B2
+# ============================================================
+class _S3Body(ObjectBody):
+    def __init__(self, body):
+        self._body = body
+
+    async def read(self, amt: Optional[int] = None) -> bytes:
+        return await self._body.read(amt)
+
+    async def close(self) -> None:
+        await self._body.close()
+
+
+class _S3Writer(ObjectWriter):
+    def __init__(self, writer: AsyncMultipartWriter):
+        self._writer = writer
+
+    async def write(self, data: bytes) -> None:
+        await self._writer.write(data)
+
+    async def close(self) -> None:
+        await self._writer.close()
+
+    async def abort(self) -> None:
+        await self._writer.abort()
+
+
+class S3Backend(StorageBackend):
+    name = "s3"
+
+    def __init__(self, bucket: str, client: Optional[AsyncB2Client] = None):
+        self.bucket = bucket
+        self.client = client or AsyncB2Client()
+
+    def open_writer(self, key: str, content_type: Optional[str] = None) -> ObjectWriter:
+        return _S3Writer(AsyncMultipartWriter(self.client, self.bucket, key, content_type=content_type))
+
+    async def open(self, key: str, byte_range: Optional[Tuple[int, int]] = None) -> Tuple[ObjectBody, int]:
+        body, size = await self.client.open_object(self.bucket, key, byte_range)
+        return _S3Body(body), size
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete_object(self.bucket, key)
+
+    async def presign_get(self, key: str, expires_in: int = 3600) -> str:
+        return await self.client.generate_presigned_get(self.bucket, key, expires_in)
+
+    async def create_multipart(self, key: str, content_type: Optional[str] = None) -> str:
+        return await self.client.create_multipart_upload(self.bucket, key, content_type)
+
+    async def presign_upload_part(self, key: str, upload_id: str, part_number: int, expires_in: int = 3600) -> str:
+        return await self.client.generate_presigned_upload_part(self.bucket, key, upload_id, part_number, expires_in)
+
+    async def complete_multipart(self, key: str, upload_id: str, parts: list) -> None:
+        await self.client.complete_multipart_upload(self.bucket, key, upload_id, parts)
+
+    async def abort_multipart(self, key: str, upload_id: str) -> None:
+        await self.client.abort_multipart_upload(self.bucket, key, upload_id)
+
+    def close(self) -> None:
+        self.client.close()
+
+
+# ============================================================
+# LOCAL DISK
+# ============================================================
+class _MmapBody(ObjectBody):
+    """
+    Serves reads out of a read-only memory map of the file, so a ranged read is
+    a slice at any offset. Each slice copies the bytes and may fault pages in
+    from disk, so it runs in a worker thread.
+    """
+
+    def __init__(self, fd: int, size: int, start: int, end: int):
+        self._fd = fd
+        self._mm = mmap.mmap(fd, size, access=mmap.ACCESS_READ) if size else None
+        self._pos = start
+        self._end = end + 1
+
+    async def read(self, amt: Optional[int] = None) -> bytes:
+        if self._mm is None or self._pos >= self._end:
+            return b""
+        start = self._pos
+        self._pos = self._end if amt is None else min(start + amt, self._end)
+        return await asyncio.to_thread(self._mm.__getitem__, slice(start, self._pos))
+
+    async def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class _LocalWriter(ObjectWriter):
+    """
+    Writes to a temp file next to the target and publishes it with an atomic rename.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._tmp = os.path.join(os.path.dirname(path), f".tmp-{uuid.uuid4().hex}")
+        self._fh = None
+
+    def _write(self, data: bytes) -> None:
+        if self._fh is None:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            self._fh = open(self._tmp, "wb")
+        self._fh.write(data)
+
+    async def write(self, data: bytes) -> None:
+        await asyncio.to_thread(self._write, data)
+
+    def _commit(self) -> None:
+        self._write(b"")
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        os.replace(self._tmp, self._path)
+
+    async def close(self) -> None:
+        await asyncio.to_thread(self._commit)
+
+    def _discard(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+        try:
+            os.remove(self._tmp)
+        except FileNotFoundError:
+            pass
+
+    async def abort(self) -> None:
+        await asyncio.to_thread(self._discard)
+
+
+class LocalDiskBackend(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    def open_writer(self, key: str, content_type: Optional[str] = None) -> ObjectWriter:
+        return _LocalWriter(self._path(key))
+
+    @staticmethod
+    def _open_mapped(path: str, byte_range: Optional[Tuple[int, int]]) -> Tuple[ObjectBody, int]:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            start, end = byte_range if byte_range else (0, size - 1)
+            return _MmapBody(fd, size, start, min(end, size - 1)), size
+        except Exception:
+            os.close(fd)
+            raise
+
+    async def open(self, key: str, byte_range: Optional[Tuple[int, int]] = None) -> Tuple[ObjectBody, int]:
+        return await asyncio.to_thread(self._open_mapped, self._path(key), byte_range)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # already gone, as S3 and memory treat it
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self._remove, self._path(key))
+
+
+# ============================================================
+# IN-MEMORY
+# ============================================================
+class _BytesBody(ObjectBody):
+    def __init__(self, data: bytes, start: int, end: int):
+        self._view = memoryview(data)[start:end + 1]
+        self._pos = 0
+
+    async def read(self, amt: Optional[int] = None) -> bytes:
+        stop = len(self._view) if amt is None else min(self._pos + amt, len(self._view))
+        data = bytes(self._view[self._pos:stop])
+        self._pos = stop
+        return data
+
+
+class _MemoryWriter(ObjectWriter):
+    def __init__(self, store: Dict[str, bytes], key: str):
+        self._store = store
+        self._key = key
+        self._buf = bytearray()
+
+    async def write(self, data: bytes) -> None:
+        self._buf += data
+
+    async def close(self) -> None:
+        self._store[self._key] = bytes(self._buf)
+        self._buf.clear()
+
+    async def abort(self) -> None:
+        self._buf.clear()
+
+
+class MemoryBackend(StorageBackend):
+    name = "memory"
+
+    def __init__(self):
+        self._objects: Dict[str, bytes] = {}
+
+    def open_writer(self, key: str, content_type: Optional[str] = None) -> ObjectWriter:
+        return _MemoryWriter(self._objects, key)
+
+    async def open(self, key: str, byte_range: Optional[Tuple[int, int]] = None) -> Tuple[ObjectBody, int]:
+        data = self._objects[key]
+        start, end = byte_range if byte_range else (0, len(data) - 1)
+        return _BytesBody(data, start, end), len(data)
+
+    async def delete(self, key: str) -> None:
+        self._objects.pop(key, None)
+
+
+# ============================================================
+# FACTORY
+# ============================================================
+_storage: Optional[StorageBackend] = None
+
+
+def create_storage(kind: Optional[str] = None) -> StorageBackend:
+    kind = (kind or settings.STORAGE_BACKEND).lower()
+    if kind == "s3":
+        return S3Backend(settings.B2_BUCKET)
+    if kind == "local":
+        return LocalDiskBackend(settings.LOCAL_STORAGE_PATH)
+    if kind == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown STORAGE_BACKEND: {kind}")
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def close_storage() -> None:
+    global _storage
+    if _storage is not None:
+        _storage.close()
+        _storage = None
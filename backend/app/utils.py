@@ -0,0 +1,139 @@
+# app/utils.py
+import base64
+import hashlib
+import json
+import re
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range_header(value: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range HTTP `Range` header against a resource of `size` bytes.
+    Returns an inclusive (start, end) tuple, or None when the header is absent,
+    malformed or multi-range (callers then serve the full body, as RFC 9110 allows).
+    Raises ValueError when the range is not satisfiable (-> 416).
+    """
+    if not value:
+        return None
+    m = _RANGE_RE.match(value.strip())
+    if not m:
+        return None
+    first, last = m.groups()
+    if not first and not last:
+        return None
+
+    if not first:
+        # suffix range: last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+# -------------------------
+# Conditional requests (ETags)
+# -------------------------
+def make_etag(*parts) -> str:
+    """
+    Strong ETag (quoted) for a representation identified by `parts`.
+    """
+    digest = hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def json_etag(payload) -> str:
+    """
+    Strong ETag over a JSON-serialisable body.
+    """
+    return make_etag(json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check (weak comparison, RFC 9110 13.1.2): true when the client's
+    cached copy is current and a 304 can be sent.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def if_range_allows(if_range: Optional[str], etag: str) -> bool:
+    """
+    If-Range check (strong comparison): a Range is honoured only when the
+    validator still matches; otherwise the full body is sent. Dates are not
+    used as validators here and never match.
+    """
+    return not if_range or (not if_range.startswith("W/") and if_range.strip() == etag)
+
+
+# -------------------------
+# Opaque keyset cursors
+# -------------------------
+def encode_cursor(*values) -> str:
+    """
+    Encode the sort key of the last row on a page as an opaque, URL-safe cursor.
+    datetimes are tagged so they round-trip exactly.
+    """
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, arity: int) -> Tuple:
+    """
+    Inverse of encode_cursor. Raises ValueError on anything malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = tuple(
+            datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in payload
+        )
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError("Invalid cursor") from e
+    if len(values) != arity:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page_size(limit: Optional[int]) -> int:
+    """
+    Clamp a requested page size to [1, PAGE_SIZE_MAX] (PAGE_SIZE_DEFAULT if omitted).
+    """
+    if not limit:
+        return settings.PAGE_SIZE_DEFAULT
+    return max(1, min(limit, settings.PAGE_SIZE_MAX))
+
+
+def cursor_key(cursor: Optional[str], arity: int = 2) -> Optional[Tuple]:
+    """
+    Decode a request's `cursor` query param, turning bad input into a 400.
+    """
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor, arity)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def next_cursor(key: Optional[Tuple]) -> Optional[str]:
+    return encode_cursor(*key) if key is not None else None
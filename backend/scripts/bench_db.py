@@ -0,0 +1,115 @@
+"""
+Compare the sync (threadpool) and async database paths under concurrent load.
+
+Usage (from backend/, ideally against a scratch DATABASE_URL):
+    python scripts/bench_db.py [--clients 200] [--requests 20000] [--threads 40]
+
+`--clients` simulated callers each issue requests back to back. Every request
+is one patient lookup by id or one keyset page of patients, picked at random.
+
+- sync:  the old route shape. Each request runs a sync Session on a thread
+         pool capped at --threads (FastAPI/anyio's default is 40), so excess
+         callers queue for a thread.
+- async: the current route shape. Each request awaits crud on an AsyncSession.
+
+Latency is measured from issue to completion, so it includes pool queueing.
+Reports p50/p99 latency (ms) and throughput (req/s) for both paths.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# make backend folder importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app import crud
+from app.db import engine, async_engine, async_session_factory, init_db
+from app.models import Patient
+
+PAGE = 50
+
+
+def _seed(rows: int) -> list:
+    with Session(engine) as session:
+        have = session.exec(select(func.count()).select_from(Patient)).one()
+        if have < rows:
+            session.add_all(
+                Patient(name=f"Bench Patient {i}", age=20 + i % 60, condition="benchmark")
+                for i in range(have, rows)
+            )
+            session.commit()
+        return list(session.exec(select(Patient.id)).all())
+
+
+def _sync_op(ids: list) -> None:
+    with Session(engine, expire_on_commit=False) as session:
+        if random.random() < 0.5:
+            session.get(Patient, random.choice(ids))
+        else:
+            session.exec(select(Patient).order_by(Patient.created_at, Patient.id).limit(PAGE)).all()
+
+
+async def _async_op(ids: list) -> None:
+    async with async_session_factory() as session:
+        if random.random() < 0.5:
+            await crud.get_patient(session, random.choice(ids))
+        else:
+            await crud.list_patients(session, limit=PAGE)
+
+
+async def _drive(op, clients: int, total: int) -> tuple:
+    latencies = []
+    remaining = total
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            t0 = time.perf_counter()
+            await op()
+            latencies.append(time.perf_counter() - t0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return latencies, time.perf_counter() - start
+
+
+def _report(name: str, latencies: list, elapsed: float) -> None:
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+    print(
+        f"{name:>5}: p50 {p(0.50):7.2f} ms   p99 {p(0.99):7.2f} ms   "
+        f"{len(latencies) / elapsed:8.0f} req/s   ({len(latencies)} requests, {elapsed:.2f}s)"
+    )
+
+
+async def main(clients: int, total: int, threads: int, rows: int) -> None:
+    init_db()
+    ids = _seed(rows)
+
+    pool = ThreadPoolExecutor(max_workers=threads)
+    loop = asyncio.get_running_loop()
+    try:
+        _report("sync", *await _drive(lambda: loop.run_in_executor(pool, _sync_op, ids), clients, total))
+    finally:
+        pool.shutdown()
+
+    _report("async", *await _drive(lambda: _async_op(ids), clients, total))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=2000, help="seed the patient table up to this many rows")
+    args = parser.parse_args()
+    asyncio.run(main(args.clients, args.requests, args.threads, args.rows))
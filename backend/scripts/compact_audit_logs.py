@@ -0,0 +1,53 @@
+"""
+Move closed months of audit history out of the live table into encrypted
+Parquet archives in object storage.
+
+Usage (from backend/), e.g. monthly from cron:
+    python scripts/compact_audit_logs.py [--hot-months 3] [--dry-run]
+
+Every month older than the hot window (the current month plus the previous
+hot-months - 1) is written to one archive object and then removed from the
+live table; on Postgres its partition is detached and dropped. On Postgres the
+run also creates upcoming monthly partitions. Safe to re-run: months with no
+live rows are skipped, and late events for an archived month go into an extra
+archive for that month.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+# make backend folder importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.db import close_db
+from app.services import audit_archive, crypto
+from app.services.storage import close_storage
+
+
+async def run(hot_months: int, dry_run: bool) -> None:
+    try:
+        results = await audit_archive.compact(hot_months, dry_run=dry_run)
+    finally:
+        close_storage()
+        await close_db()
+    for r in results:
+        where = f" -> {r['object_key']} ({r['size_bytes']} bytes)" if "object_key" in r else ""
+        print(f"{r['period']}: {r['rows']} rows{where}", flush=True)
+    verb = "would archive" if dry_run else "archived"
+    print(f"done: {verb} {sum(r['rows'] for r in results)} rows from {len(results)} month(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hot-months", type=int, default=settings.AUDIT_HOT_MONTHS)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be archived")
+    args = parser.parse_args()
+
+    crypto.init_master_key()
+    asyncio.run(run(args.hot_months, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Bulk import or export patient records as CSV or NDJSON.
+
+Usage (from backend/):
+    python scripts/patient_bulk.py import patients.csv [--format csv]
+    python scripts/patient_bulk.py export patients.ndjson [--format ndjson]
+
+The format defaults to the file extension (.csv, .ndjson, .jsonl); "-" reads
+stdin / writes stdout. Import prints a summary and the per-line errors, and
+exits non-zero if any row was rejected. Uses the same batching as the
+/patients/import and /patients/export endpoints (PATIENT_IMPORT_BATCH_SIZE,
+PATIENT_EXPORT_FETCH_SIZE).
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# make backend folder importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import close_db, init_db
+from app.services import patient_io
+
+
+async def run_import(path: str, fmt: str) -> int:
+    started = time.perf_counter()
+    try:
+        if path == "-":
+            report = await patient_io.import_patients(sys.stdin.buffer, fmt)
+        else:
+            with open(path, "rb") as f:
+                report = await patient_io.import_patients(f, fmt)
+    finally:
+        await close_db()
+    for err in report["errors"]:
+        print(f"line {err['line']}: {'; '.join(err['errors'])}", file=sys.stderr)
+    if report["errors_truncated"]:
+        print("(further errors not listed)", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    print(f"done: {report['inserted']} inserted, {report['failed']} failed in {elapsed:.1f}s")
+    return 1 if report["failed"] else 0
+
+
+async def run_export(path: str, fmt: str) -> int:
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+    try:
+        async for chunk in patient_io.export_patients(fmt):
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        await close_db()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("import", "export"))
+    parser.add_argument("path", help='input/output file, or "-" for stdin/stdout')
+    parser.add_argument("--format", choices=patient_io.FORMATS, help="default: from the file extension")
+    args = parser.parse_args()
+
+    fmt = args.format or patient_io.format_for(args.path)
+    if not fmt:
+        parser.error("cannot tell the format from the file name; pass --format")
+
+    init_db()
+    run = run_import if args.command == "import" else run_export
+    sys.exit(asyncio.run(run(args.path, fmt)))
+
+
+if __name__ == "__main__":
+    main()
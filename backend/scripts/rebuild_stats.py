@@ -0,0 +1,43 @@
+"""
+Recompute the dashboard counters (StatCounter) from the base tables.
+
+Usage (from backend/):
+    python scripts/rebuild_stats.py
+
+The counters are normally kept current by the write paths; run this after a
+restore, a bulk fix made with raw SQL, or periodically from cron as a
+consistency sweep. It replaces every counter in one transaction. Only live
+audit rows count towards doctor activity; compacted months are too old to
+matter for the active-doctors window.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# make backend folder importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import async_session_factory, close_db, init_db
+from app.services import stats
+
+
+async def run() -> None:
+    started = time.perf_counter()
+    try:
+        async with async_session_factory() as session:
+            written = await stats.rebuild(session)
+    finally:
+        await close_db()
+    print(f"done: {written} counters in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    init_db()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
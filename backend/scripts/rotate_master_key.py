@@ -0,0 +1,114 @@
+"""
+Re-wrap every FileRecord and AuditArchive DEK under the current master key.
+
+Usage (from backend/):
+    1. move the old key to MASTER_FERNET_OLD_KEYS, set the new MASTER_FERNET_KEY
+       and bump MASTER_KEY_VERSION
+    2. python scripts/rotate_master_key.py [--batch-size 2000] [--workers 4]
+
+Rows are streamed in keyset-paginated batches (id > last_id) of records whose
+key_version differs from the current one. Each batch is re-wrapped in parallel
+across a process pool and written back with one executemany UPDATE, committed
+per batch, so the table is never locked for longer than one batch.
+
+The job is idempotent and resumable: already rotated rows are skipped by the
+key_version filter, so re-running after a crash just picks up the remainder.
+An UPDATE only applies if the row still holds the token that was read, so it
+never clobbers a concurrent change.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# make backend folder importable when run as a script
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, select, update
+
+from app.db import engine
+from app.models import AuditArchive, FileRecord
+from app.services import crypto
+
+
+def _init_worker():
+    crypto.init_master_key()
+
+
+def _rewrap_chunk(rows):
+    """
+    Runs in a worker process: [(id, old_token)] -> update parameter dicts.
+    """
+    return [
+        {"b_id": rec_id, "b_old": token, "b_new": crypto.rewrap_dek(token)}
+        for rec_id, token in rows
+    ]
+
+
+def _split(rows, parts):
+    size = max(1, -(-len(rows) // parts))
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+def rotate(
+    batch_size: int = 2000,
+    workers: int = os.cpu_count() or 1,
+    start_after: int = 0,
+    model=FileRecord,
+) -> int:
+    version = crypto.current_key_version()
+    table = model.__table__
+    fetch = (
+        select(table.c.id, table.c.wrapped_dek)
+        .where(
+            table.c.id > bindparam("last_id"),
+            table.c.key_version != version,
+            table.c.wrapped_dek.is_not(None),
+        )
+        .order_by(table.c.id)
+        .limit(batch_size)
+    )
+    apply = (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.wrapped_dek == bindparam("b_old"))
+        .values(wrapped_dek=bindparam("b_new"), key_version=version)
+    )
+
+    last_id = start_after
+    total = 0
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        while True:
+            with engine.connect() as conn:
+                rows = [tuple(r) for r in conn.execute(fetch, {"last_id": last_id})]
+            if not rows:
+                break
+
+            params = [p for chunk in pool.map(_rewrap_chunk, _split(rows, workers)) for p in chunk]
+
+            with engine.begin() as conn:
+                conn.execute(apply, params)
+
+            last_id = rows[-1][0]
+            total += len(rows)
+            rate = total / max(time.monotonic() - started, 1e-9)
+            print(f"{table.name}: rotated {total} keys (last id {last_id}, {rate:.0f}/s)", flush=True)
+
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--start-after", type=int, default=0, help="resume after this FileRecord id")
+    args = parser.parse_args()
+
+    total = rotate(args.batch_size, args.workers, args.start_after)
+    total += rotate(args.batch_size, args.workers, model=AuditArchive)
+    print(f"done: {total} keys re-wrapped to version {crypto.current_key_version()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,7 +25,16 @@ def run_test():
     pt = crypto.decrypt_aes_gcm(ct, dek2)
     print("Decrypted:", pt)
 
-    if pt == plaintext:
+    print("Stream-encrypting (small chunks)...")
+    enc = crypto.StreamEncryptor(dek, chunk_size=8)
+    stream = enc.header + enc.update(plaintext[:5]) + enc.update(plaintext[5:]) + enc.finalize()
+    print("Stream bytes length:", len(stream))
+
+    print("Stream-decrypting...")
+    pt_stream = crypto.decrypt_file_bytes(stream, dek2)
+    print("Stream decrypted:", pt_stream)
+
+    if pt == plaintext and pt_stream == plaintext:
         print("✅ Crypto test succeeded.")
     else:
         print("❌ Crypto test failed.")
@@ -18,17 +18,36 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
   }
 
   // -------------------------------------------------------
-  // FETCH PATIENTS
+  // PAGINATED LISTS ({ items, next_cursor })
   // -------------------------------------------------------
-  async function fetchPatients() {
-    try {
-      const res = await fetch(`${API_URL}/patients`, {
+  async function fetchAllPages(path: string) {
+    const items: any[] = [];
+    let cursor: string | null = null;
+
+    do {
+      const url = cursor ? `${path}?cursor=${encodeURIComponent(cursor)}` : path;
+      const res = await fetch(`${API_URL}${url}`, {
         headers: authHeader(),
       });
 
-      if (!res.ok) return;
+      if (!res.ok) return null;
+
+      const page = await res.json();
+      items.push(...page.items);
+      cursor = page.next_cursor;
+    } while (cursor);
+
+    return items;
+  }
+
+  // -------------------------------------------------------
+  // FETCH PATIENTS
+  // -------------------------------------------------------
+  async function fetchPatients() {
+    try {
+      const data = await fetchAllPages("/patients/");
+      if (!data) return;
 
-      const data = await res.json();
       setPatients(data);
     } catch (err) {
       console.error("Error fetching patients", err);
@@ -95,13 +114,9 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
   // 🔄 Refresh files list for a patient
   async function refreshFilesForPatient(patientId: number) {
     try {
-      const res = await fetch(`${API_URL}/files/patient/${patientId}`, {
-        headers: authHeader(),
-      });
+      const files = await fetchAllPages(`/files/patient/${patientId}`);
+      if (!files) return;
 
-      if (!res.ok) return;
-
-      const files = await res.json();
       setFilesByPatient((prev) => ({
         ...prev,
         [patientId]: files,
@@ -140,6 +155,34 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
     return await res.json();
   }
 
+  // 📤 Upload many reports in one request (server encrypts them concurrently)
+  async function uploadReports(patientId: number, files: File[]) {
+    const formData = new FormData();
+    files.forEach((file) => formData.append("files", file));
+    formData.append("patient_id", patientId.toString());
+
+    const res = await fetch(`${API_URL}/files/upload-batch`, {
+      method: "POST",
+      headers: {
+        ...authHeader(), // browser sets the multipart boundary
+      },
+      body: formData,
+    });
+
+    if (!res.ok) {
+      const error = await res.json().catch(() => ({ detail: "Upload failed" }));
+      console.error("Batch upload error:", error);
+      throw new Error(JSON.stringify(error));
+    }
+
+    try {
+      await refreshFilesForPatient(patientId);
+    } catch (_) {}
+
+    // { uploaded, failed, results: [{ filename, ok, file?, error? }] }
+    return await res.json();
+  }
+
   // -------------------------
   // DOWNLOAD helper (existing)
   // -------------------------
@@ -210,6 +253,7 @@ export function DataProvider({ children }: { children: React.ReactNode }) {
         deletePatient,
         refreshFilesForPatient,
         uploadReport,
+        uploadReports,
         downloadFile, // make sure components can call it
         previewFile, // NEW: exposed so ViewReports can call previewFile(...)
       }}
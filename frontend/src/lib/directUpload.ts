@@ -0,0 +1,114 @@
+// src/lib/directUpload.ts
+//
+// Direct-to-storage upload: the browser encrypts the file with WebCrypto AES-GCM
+// in the same segmented stream format the backend uses, and PUTs the ciphertext
+// straight to object storage through presigned multipart URLs. The API only issues
+// the key + URLs and verifies the result, so file bytes never pass through it.
+//
+// Note: the bucket's CORS rules must allow PUT from the app origin and expose
+// the "ETag" response header.
+
+const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
+
+function authHeader() {
+  const token = localStorage.getItem("token");
+  return token ? { Authorization: `Bearer ${token}` } : {};
+}
+
+async function postJson(path: string, body: any) {
+  const res = await fetch(`${API_URL}${path}`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json", ...authHeader() },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return res.json();
+}
+
+function fromBase64(b64: string): Uint8Array {
+  return Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+}
+
+// nonce = 7-byte prefix from the header || chunk counter (uint32 BE) || last-chunk flag
+function chunkNonce(prefix: Uint8Array, index: number, last: boolean): Uint8Array {
+  const nonce = new Uint8Array(12);
+  nonce.set(prefix, 0);
+  new DataView(nonce.buffer).setUint32(7, index);
+  nonce[11] = last ? 1 : 0;
+  return nonce;
+}
+
+export async function directUploadReport(patientId: number, file: File) {
+  // 1) Ask the API for a DEK, stream header and presigned part URLs
+  const ticket = await postJson("/files/direct-upload/init", {
+    patient_id: patientId,
+    filename: file.name,
+    size: file.size,
+    content_type: file.type || null,
+  });
+
+  try {
+    const header = fromBase64(ticket.header);
+    const prefix = header.slice(8, 15);
+    const key = await crypto.subtle.importKey(
+      "raw",
+      fromBase64(ticket.dek),
+      "AES-GCM",
+      false,
+      ["encrypt"]
+    );
+
+    const completed: { part_number: number; etag: string }[] = [];
+    const part = new Uint8Array(ticket.part_size);
+    let fill = 0;
+
+    async function flushPart() {
+      const partNumber = completed.length + 1;
+      const url = ticket.parts[partNumber - 1].url;
+      const res = await fetch(url, { method: "PUT", body: part.slice(0, fill) });
+      if (!res.ok) throw new Error(`Part ${partNumber} upload failed`);
+      completed.push({ part_number: partNumber, etag: res.headers.get("ETag") || "" });
+      fill = 0;
+    }
+
+    async function write(bytes: Uint8Array) {
+      let offset = 0;
+      while (offset < bytes.length) {
+        const n = Math.min(bytes.length - offset, part.length - fill);
+        part.set(bytes.subarray(offset, offset + n), fill);
+        fill += n;
+        offset += n;
+        if (fill === part.length) await flushPart();
+      }
+    }
+
+    // 2) Encrypt chunk by chunk and stream parts to storage
+    await write(header);
+    const chunkSize = ticket.chunk_size;
+    const chunkCount = Math.max(1, Math.ceil(file.size / chunkSize));
+    for (let i = 0; i < chunkCount; i++) {
+      const plain = await file.slice(i * chunkSize, (i + 1) * chunkSize).arrayBuffer();
+      const sealed = await crypto.subtle.encrypt(
+        {
+          name: "AES-GCM",
+          iv: chunkNonce(prefix, i, i === chunkCount - 1),
+          additionalData: header,
+          tagLength: 128,
+        },
+        key,
+        plain
+      );
+      await write(new Uint8Array(sealed));
+    }
+    if (fill > 0) await flushPart();
+
+    // 3) Let the API verify the object and create the FileRecord
+    return await postJson("/files/direct-upload/complete", {
+      upload_token: ticket.upload_token,
+      parts: completed,
+    });
+  } catch (err) {
+    await postJson("/files/direct-upload/abort", { upload_token: ticket.upload_token }).catch(() => {});
+    throw err;
+  }
+}